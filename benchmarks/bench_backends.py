@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from bench_build_model import DATA_DIR, make_scaled_instance
+from src.shift_scheduler.backends import available_backends, get_backend
+
+# 比較に使う問題例（スタッフ方向・日付方向の複製数）
+INSTANCES = {"sample": (1, 1), "10x": (5, 2), "100x": (10, 10), "500x": (25, 20)}
+
+TIME_LIMIT = 120  # 各バックエンドの制限時間（秒）
+
+
+def main():
+    staff_df = pd.read_csv(os.path.join(DATA_DIR, "staff.csv"))
+    calendar_df = pd.read_csv(os.path.join(DATA_DIR, "calendar.csv"))
+    backends = available_backends()
+    print("backends:", backends)
+
+    print(
+        f"{'instance':>9} {'backend':>12} {'status':>10} "
+        f"{'objective':>11} {'time[s]':>8} {'parity':>7}"
+    )
+    for name, (staff_rep, day_rep) in INSTANCES.items():
+        staff, calendar = make_scaled_instance(
+            staff_df, calendar_df, staff_rep, day_rep
+        )
+        staff_ids = staff["スタッフID"].tolist()
+        dates = calendar["日付"].tolist()
+        staff_penalty = {s: 10 + 10 * (i % 9) for i, s in enumerate(staff_ids)}
+        staff_ng_date = {
+            s: dates[i % len(dates)] if i % 3 else "すべてOK"
+            for i, s in enumerate(staff_ids)
+        }
+
+        # 最初のバックエンドの目的関数値を基準にして、他のバックエンドと一致するかを確認する
+        reference = None
+        for backend_name in backends:
+            result = get_backend(backend_name).solve(
+                staff, calendar, staff_penalty, staff_ng_date, 50, time_limit=TIME_LIMIT
+            )
+            objective = result["objective"]
+            if reference is None:
+                reference = objective
+            parity = (
+                objective is not None
+                and reference is not None
+                and abs(objective - reference) <= 1e-6 * max(1.0, abs(reference))
+            )
+            print(
+                f"{name:>9} {backend_name:>12} {result['status']:>10} "
+                f"{'-' if objective is None else f'{objective:.1f}':>11} "
+                f"{result['solve_time']:>8.3f} {str(parity):>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.shift_scheduler.batch import find_instances, run_batch
+from src.shift_scheduler.instance_generator import generate_instance, write_instance
+
+N_INSTANCES = 24  # 店舗の数
+N_STAFF = 60
+N_DAYS = 28
+TIME_LIMIT = 30
+
+
+def main():
+    work_dir = tempfile.mkdtemp()
+    try:
+        in_dir = os.path.join(work_dir, "instances")
+        for i in range(N_INSTANCES):
+            staff_df, calendar_df, staff_ng_date = generate_instance(
+                N_STAFF, N_DAYS, tightness=0.9, seed=i
+            )
+            write_instance(
+                os.path.join(in_dir, f"store_{i:03d}"),
+                staff_df,
+                calendar_df,
+                staff_ng_date,
+            )
+        instances = find_instances(in_dir)
+        print(
+            f"{len(instances)} instances: {N_STAFF} staff x {N_DAYS} days, "
+            f"{os.cpu_count()} CPUs"
+        )
+
+        # 同時に動かすCBCの数を変えて、全体のスループットと問題例ごとのレイテンシを比べる
+        print(
+            f"{'workers':>7} {'wall[s]':>8} {'inst/s':>7} {'p50[s]':>7} "
+            f"{'p95[s]':>7} {'max[s]':>7} {'failed':>6}"
+        )
+        for workers in sorted({1, 2, os.cpu_count() or 1}):
+            out_dir = os.path.join(work_dir, f"out_{workers}")
+            _, summary = run_batch(
+                instances,
+                out_dir,
+                max_workers=workers,
+                solver_options={"time_limit": TIME_LIMIT},
+            )
+            print(
+                f"{workers:>7} {summary['wall_time']:>8.2f} "
+                f"{summary['throughput']:>7.2f} {summary['latency_p50']:>7.2f} "
+                f"{summary['latency_p95']:>7.2f} {summary['latency_max']:>7.2f} "
+                f"{summary['failed']:>6}"
+            )
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
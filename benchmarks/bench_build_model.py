@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from src.shift_scheduler.ShiftScheduler_8_2 import ShiftScheduler
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+
+# サンプルデータに対する倍率と、そのときのスタッフ方向・日付方向の複製数
+SCALES = {10: (5, 2), 100: (10, 10), 1000: (40, 25)}
+
+
+def make_scaled_instance(staff_df, calendar_df, staff_rep, day_rep):
+    # スタッフをstaff_rep倍、日付をday_rep倍に複製した問題例を作る
+    staff = pd.concat(
+        [
+            staff_df.assign(スタッフID=staff_df["スタッフID"] + f"_{i}")
+            for i in range(staff_rep)
+        ],
+        ignore_index=True,
+    )
+    staff["希望最小出勤日数"] *= day_rep
+    staff["希望最大出勤日数"] *= day_rep
+
+    calendar = pd.concat(
+        [
+            calendar_df.assign(日付=calendar_df["日付"] + f"_{i}")
+            for i in range(day_rep)
+        ],
+        ignore_index=True,
+    )
+    calendar["出勤人数"] *= staff_rep
+    calendar["責任者人数"] *= staff_rep
+    return staff, calendar
+
+
+def measure(staff_df, calendar_df, method):
+    # モデル構築にかかる時間とピークメモリを計測する
+    staff_penalty = {s: 50 for s in staff_df["スタッフID"]}
+    # 休暇希望はスタッフごとに日付を順番に割り当てる
+    dates = calendar_df["日付"].tolist()
+    staff_ng_date = {
+        s: dates[i % len(dates)] for i, s in enumerate(staff_df["スタッフID"])
+    }
+
+    shift_sch = ShiftScheduler()
+    shift_sch.set_data(staff_df, calendar_df, staff_penalty, staff_ng_date, 50)
+
+    # tracemallocは実行を遅くするため、時間とメモリは別々の構築で計測する
+    start = time.perf_counter()
+    getattr(shift_sch, method)()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    getattr(shift_sch, method)()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2, shift_sch.model
+
+
+def main():
+    staff_df = pd.read_csv(os.path.join(DATA_DIR, "staff.csv"))
+    calendar_df = pd.read_csv(os.path.join(DATA_DIR, "calendar.csv"))
+
+    print(
+        f"{'scale':>6} {'staff':>6} {'days':>5} "
+        f"{'loop[s]':>9} {'vector[s]':>10} {'speedup':>8} "
+        f"{'loop[MB]':>9} {'vector[MB]':>11} {'same':>5}"
+    )
+    for scale, (staff_rep, day_rep) in SCALES.items():
+        staff, calendar = make_scaled_instance(
+            staff_df, calendar_df, staff_rep, day_rep
+        )
+        loop_time, loop_mem, loop_model = measure(staff, calendar, "build_model_loop")
+        vec_time, vec_mem, vec_model = measure(staff, calendar, "build_model")
+        # 両方の実装が同じ制約を作っているかを確認する
+        same = [str(c) for c in loop_model.constraints()] == [
+            str(c) for c in vec_model.constraints()
+        ] and str(loop_model.objective) == str(vec_model.objective)
+        print(
+            f"{scale:>5}x {len(staff):>6} {len(calendar):>5} "
+            f"{loop_time:>9.3f} {vec_time:>10.3f} {loop_time / vec_time:>7.2f}x "
+            f"{loop_mem:>9.1f} {vec_mem:>11.1f} {str(same):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
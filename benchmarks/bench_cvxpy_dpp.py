@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from bench_build_model import DATA_DIR, make_scaled_instance
+from src.shift_scheduler.ShiftScheduler_9 import ShiftScheduler
+
+# 混合整数二次計画を解けるCVXPYのソルバー（例: SCIP, GUROBI）。引数で変更できる
+SOLVER = sys.argv[1] if len(sys.argv) > 1 else "SCIP"
+
+# 混合整数二次計画は規模が大きくなると解けなくなるため、サンプルデータの規模で比べる
+INSTANCES = {"sample": (1, 1)}
+REPEATS = 3  # ペナルティを変えて解き直す回数
+
+
+def main():
+    staff_df = pd.read_csv(os.path.join(DATA_DIR, "staff.csv"))
+    calendar_df = pd.read_csv(os.path.join(DATA_DIR, "calendar.csv"))
+
+    print(f"solver: {SOLVER}")
+    print(
+        f"{'instance':>9} {'run':>8} {'build[s]':>9} "
+        f"{'compile[s]':>11} {'solve[s]':>9} {'objective':>10}"
+    )
+    for name, (staff_rep, day_rep) in INSTANCES.items():
+        staff, calendar = make_scaled_instance(
+            staff_df, calendar_df, staff_rep, day_rep
+        )
+        staff_ids = staff["スタッフID"].tolist()
+
+        shift_sch = ShiftScheduler()
+        shift_sch.set_data(staff, calendar, {s: 50 for s in staff_ids})
+        start = pd.Timestamp.now()
+        shift_sch.build_model()
+        build_time = (pd.Timestamp.now() - start).total_seconds()
+
+        # 1回目は問題の変換を行い、2回目以降はパラメータの値だけを変えて解き直す
+        for run in range(REPEATS + 1):
+            if run > 0:
+                shift_sch.update_penalty(
+                    {s: 10 + (i + run) % 5 * 10 for i, s in enumerate(staff_ids)}
+                )
+            shift_sch.solve(solver=SOLVER)
+            print(
+                f"{name:>9} {'first' if run == 0 else f'resolve{run}':>8} "
+                f"{build_time if run == 0 else 0.0:>9.3f} "
+                f"{shift_sch.compile_time:>11.4f} {shift_sch.solve_time:>9.3f} "
+                f"{shift_sch.prob.value:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
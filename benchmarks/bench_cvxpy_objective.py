@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from bench_build_model import DATA_DIR, make_scaled_instance
+from src.shift_scheduler.ShiftScheduler_9 import ShiftScheduler
+
+# 二次の目的関数を解くソルバーと、区分線形近似の目的関数を解くソルバー
+QUADRATIC_SOLVER = "SCIP"
+LINEAR_SOLVER = "HIGHS"
+
+# 比較に使う問題例（スタッフ方向・日付方向の複製数）
+# 混合整数二次計画は規模が大きくなると解けなくなるため、sample以外では線形の場合だけ解く
+INSTANCES = {"sample": (1, 1), "10x": (5, 2), "100x": (10, 10)}
+QUADRATIC_INSTANCES = ["sample"]
+
+# 区分線形近似の折れ点（Noneはすべての整数で、整数解に対しては二乗と一致する）
+BREAKPOINTS = {"exact": None, "coarse": [0, 2, 5, 10, 20, 40]}
+
+TIME_LIMIT = 120  # 各ソルバーの制限時間（秒）
+
+
+def main():
+    staff_df = pd.read_csv(os.path.join(DATA_DIR, "staff.csv"))
+    calendar_df = pd.read_csv(os.path.join(DATA_DIR, "calendar.csv"))
+
+    print(
+        f"{'instance':>9} {'objective':>16} {'status':>10} {'build[s]':>9} "
+        f"{'compile[s]':>11} {'solve[s]':>9} {'model obj':>10} {'quad obj':>10} "
+        f"{'gap[%]':>7}"
+    )
+    for name, (staff_rep, day_rep) in INSTANCES.items():
+        staff, calendar = make_scaled_instance(
+            staff_df, calendar_df, staff_rep, day_rep
+        )
+        staff_ids = staff["スタッフID"].tolist()
+        staff_penalty = {s: 1 + i % 5 for i, s in enumerate(staff_ids)}
+
+        runs = [("linear", label, bp) for label, bp in BREAKPOINTS.items()]
+        if name in QUADRATIC_INSTANCES:
+            runs.insert(0, ("quadratic", "", None))
+
+        # 二乗和で評価した目的関数値を、最初の結果（二次、なければ厳密な区分線形）と比べる
+        reference = None
+        for mode, label, breakpoints in runs:
+            shift_sch = ShiftScheduler()
+            shift_sch.set_data(staff, calendar, staff_penalty)
+            start = pd.Timestamp.now()
+            shift_sch.build_model(mode, breakpoints)
+            build_time = (pd.Timestamp.now() - start).total_seconds()
+            if mode == "quadratic":
+                shift_sch.solve(solver=QUADRATIC_SOLVER)
+            else:
+                shift_sch.solve(solver=LINEAR_SOLVER, time_limit=TIME_LIMIT)
+
+            quadratic_value = shift_sch.evaluate_quadratic_objective()
+            if reference is None:
+                reference = quadratic_value
+            gap = 100 * (quadratic_value - reference) / max(1.0, reference)
+            print(
+                f"{name:>9} {mode + (f'({label})' if label else ''):>16} "
+                f"{shift_sch.prob.status:>10} {build_time:>9.3f} "
+                f"{shift_sch.compile_time:>11.4f} {shift_sch.solve_time:>9.3f} "
+                f"{shift_sch.prob.value:>10.1f} {quadratic_value:>10.1f} {gap:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
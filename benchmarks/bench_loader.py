@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from src.shift_scheduler import data_loader
+from src.shift_scheduler.instance_generator import generate_instance
+
+SIZES = [1_000, 100_000, 1_000_000]  # スタッフ数
+REPEATS = 3  # 読み込みを繰り返す回数（最小の時間を使う）
+
+
+def best_time(func):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def cold_load(data):
+    # キャッシュを空にして、パースと検証を含めた時間を計測する
+    data_loader.clear_cache()
+    return data_loader.load_staff(data)
+
+
+def main():
+    print(
+        f"{'staff':>9} {'format':>8} {'size[MB]':>9} {'read_csv[s]':>12} "
+        f"{'load[s]':>9} {'cached[s]':>10} {'pandas[MB]':>11} {'loader[MB]':>11}"
+    )
+    for n_staff in SIZES:
+        staff_df, _, _ = generate_instance(n_staff, 28, seed=0)
+        csv = staff_df.to_csv(index=False).encode("utf-8")
+        parquet = io.BytesIO()
+        staff_df.to_parquet(parquet)
+        # 比較用：これまでのアプリと同じく、型を推定してread_csvで読み込む
+        read_csv_time = best_time(lambda: pd.read_csv(io.BytesIO(csv)))
+        pandas_mb = pd.read_csv(io.BytesIO(csv)).memory_usage(deep=True).sum()
+        for name, data in (("csv", csv), ("parquet", parquet.getvalue())):
+            load_time = best_time(lambda: cold_load(data))
+            cached_time = best_time(lambda: data_loader.load_staff(data))
+            loader_mb = data_loader.load_staff(data).memory_usage(deep=True).sum()
+            print(
+                f"{n_staff:>9} {name:>8} {len(data) / 1024**2:>9.2f} "
+                f"{read_csv_time:>12.4f} {load_time:>9.4f} {cached_time:>10.4f} "
+                f"{pandas_mb / 1024**2:>11.2f} {loader_mb / 1024**2:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
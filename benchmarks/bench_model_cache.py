@@ -0,0 +1,101 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from bench_build_model import DATA_DIR, make_scaled_instance
+from src.shift_scheduler.model_cache import ModelCache
+from src.shift_scheduler.ShiftScheduler_8_2 import ShiftScheduler
+
+# サンプルデータ(7スタッフ×7日)を複製して約500スタッフ×60日の問題例にする
+STAFF_REP = 72
+DAY_REP = 9
+VARIANTS = 5  # ペナルティと必要人数を変えて解く回数
+
+
+def make_variants(staff_df, calendar_df, seed=0):
+    # 構造（スタッフ、日付、責任者フラグ、休暇希望）は同じで、ペナルティと必要人数だけが違う問題を作る
+    rng = np.random.default_rng(seed)
+    staff_ids = staff_df["スタッフID"].tolist()
+    variants = []
+    for _ in range(VARIANTS):
+        calendar = calendar_df.copy()
+        calendar["出勤人数"] += rng.integers(-2, 3, len(calendar))
+        penalty = dict(zip(staff_ids, rng.integers(10, 100, len(staff_ids)).tolist()))
+        variants.append((calendar, penalty, int(rng.integers(10, 100))))
+    return variants
+
+
+def solve(staff_df, calendar_df, penalty, staff_ng_date, off_penalty, model_cache):
+    shift_sch = ShiftScheduler()
+    start = time.perf_counter()
+    shift_sch.set_data(staff_df, calendar_df, penalty, staff_ng_date, off_penalty)
+    if model_cache is None:
+        hit = False
+        shift_sch.build_model()
+    else:
+        hit = shift_sch.build_model_cached(model_cache)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    shift_sch.solve()
+    solve_time = time.perf_counter() - start
+    return build_time, solve_time, hit, shift_sch.get_result()["objective"]
+
+
+def main():
+    staff_df, calendar_df = make_scaled_instance(
+        pd.read_csv(os.path.join(DATA_DIR, "staff.csv")),
+        pd.read_csv(os.path.join(DATA_DIR, "calendar.csv")),
+        STAFF_REP,
+        DAY_REP,
+    )
+    staff_ids = staff_df["スタッフID"].tolist()
+    dates = calendar_df["日付"].tolist()
+    staff_ng_date = {s: dates[i % len(dates)] for i, s in enumerate(staff_ids)}
+    print(f"instance: {len(staff_df)} staff x {len(calendar_df)} days")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        model_cache = ModelCache(cache_dir)
+        print(
+            f"{'variant':>7} {'rebuild[s]':>11} {'solve[s]':>9} "
+            f"{'cached[s]':>10} {'solve[s]':>9} {'hit':>5} {'objective':>21}"
+        )
+        for i, (calendar, penalty, off) in enumerate(
+            make_variants(staff_df, calendar_df)
+        ):
+            cold = solve(staff_df, calendar, penalty, staff_ng_date, off, None)
+            cached = solve(staff_df, calendar, penalty, staff_ng_date, off, model_cache)
+            print(
+                f"{i:>7} {cold[0]:>11.3f} {cold[1]:>9.3f} "
+                f"{cached[0]:>10.3f} {cached[1]:>9.3f} {str(cached[2]):>5} "
+                f"{cold[3]:>10} {cached[3]:>10}"
+            )
+
+        # ディスク上の上限を1モデル分にすると、休暇希望の違う（構造の違う）モデルを保存するたびに
+        # 最後に使ったのが古いものから削除される
+        size = sum(
+            os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir)
+        )
+        small_cache = ModelCache(cache_dir, max_disk_bytes=int(size * 1.5))
+        for shift in range(1, 4):
+            ng = {s: dates[(i + shift) % len(dates)] for i, s in enumerate(staff_ids)}
+            solve(
+                staff_df, calendar_df, {s: 50 for s in staff_ids}, ng, 50, small_cache
+            )
+            print(
+                f"structures: {shift + 1}, files on disk: {len(os.listdir(cache_dir))}, "
+                f"size: {size / 1024**2:.2f}MB per model"
+            )
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from bench_build_model import DATA_DIR, make_scaled_instance
+from src.shift_scheduler.ShiftScheduler_8_2 import ShiftScheduler
+
+# 比較に使う問題例（スタッフ方向・日付方向の複製数）。日付方向に長いカレンダーを作る
+INSTANCES = {"4 weeks": (3, 4), "13 weeks": (3, 13), "26 weeks": (5, 26)}
+
+# ローリングホライズンの期間の日数と、1回に確定する日数
+SETTINGS = [(14, 7), (28, 14)]
+
+TIME_LIMIT = 300  # 全体を一度に解く場合の制限時間（秒）
+
+
+def main():
+    staff_df = pd.read_csv(os.path.join(DATA_DIR, "staff.csv"))
+    calendar_df = pd.read_csv(os.path.join(DATA_DIR, "calendar.csv"))
+
+    print(
+        f"{'instance':>9} {'size':>9} {'mode':>12} {'solution':>22} "
+        f"{'objective':>10} {'time[s]':>8} {'gap[%]':>7}"
+    )
+    for name, (staff_rep, day_rep) in INSTANCES.items():
+        staff, calendar = make_scaled_instance(
+            staff_df, calendar_df, staff_rep, day_rep
+        )
+        staff_ids = staff["スタッフID"].tolist()
+        dates = calendar["日付"].tolist()
+        staff_penalty = {s: 10 + 10 * (i % 9) for i, s in enumerate(staff_ids)}
+        staff_ng_date = {
+            s: dates[(5 * i) % len(dates)] if i % 3 else "すべてOK"
+            for i, s in enumerate(staff_ids)
+        }
+        size = f"{len(staff_ids)}x{len(dates)}"
+
+        # 全体を一度に解いた結果を基準にして、ローリングホライズンの目的関数値のギャップを計算する
+        full = ShiftScheduler()
+        full.set_data(staff, calendar, staff_penalty, staff_ng_date, 50)
+        full.build_model()
+        full.solve(time_limit=TIME_LIMIT)
+        reference = full.get_result()
+        rows = [("full", reference)]
+
+        for window, step in SETTINGS:
+            rolling = ShiftScheduler()
+            rolling.set_data(staff, calendar, staff_penalty, staff_ng_date, 50)
+            rolling.solve_rolling_horizon(window, step)
+            rows.append((f"rh {window}/{step}", rolling.get_result()))
+
+        for mode, result in rows:
+            objective = result["objective"]
+            gap = "-"
+            if objective is not None and reference["objective"] is not None:
+                gap = (
+                    100
+                    * (objective - reference["objective"])
+                    / max(1.0, reference["objective"])
+                )
+                gap = f"{gap:.2f}"
+            print(
+                f"{name:>9} {size:>9} {mode:>12} {result['solution_status']:>22} "
+                f"{'-' if objective is None else f'{objective:.1f}':>10} "
+                f"{result['solve_time']:>8.2f} {gap:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
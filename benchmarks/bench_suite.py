@@ -0,0 +1,216 @@
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from src.shift_scheduler.instance_generator import generate_instance
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# 問題例の大きさ（スタッフ数, 日数）
+SIZES = {"small": (10, 14), "medium": (30, 28), "large": (100, 56)}
+
+
+def _pulp_extract(shift_sch):
+    # PuLP版（ShiftScheduler_8_2以外）のsolveの中で行っているシフト表の作成と同じ処理
+    Rows = [
+        [int(round(shift_sch.x[s, d].value())) for d in shift_sch.D]
+        for s in shift_sch.S
+    ]
+    return pd.DataFrame(Rows, index=shift_sch.S, columns=shift_sch.D)
+
+
+def _cvxpy_extract(shift_sch):
+    # CVXPY版のsolveの中で行っているシフト表の作成と同じ処理
+    return pd.DataFrame(
+        shift_sch.x.value.round().astype(int), index=shift_sch.S, columns=shift_sch.D
+    )
+
+
+# ベンチマークするShiftSchedulerの種類
+# (モジュール名, set_dataの引数, build_modelの引数, solveの引数, シフト表の作成, 解ける最大の大きさ)
+# CVXPYの二次の目的関数は大きな問題を解けないため、smallだけで計測する
+VARIANTS = {
+    "ShiftScheduler": (
+        "ShiftScheduler",
+        lambda inst: (inst["staff"], inst["calendar"]),
+        {},
+        {},
+        _pulp_extract,
+        None,
+    ),
+    "ShiftScheduler_7": (
+        "ShiftScheduler_7",
+        lambda inst: (inst["staff"], inst["calendar"], inst["penalty"]),
+        {},
+        {},
+        _pulp_extract,
+        None,
+    ),
+    "ShiftScheduler_8_1": (
+        "ShiftScheduler_8_1",
+        lambda inst: (inst["staff"], inst["calendar"], inst["penalty"], inst["ng"]),
+        {},
+        {},
+        _pulp_extract,
+        None,
+    ),
+    "ShiftScheduler_8_2": (
+        "ShiftScheduler_8_2",
+        lambda inst: (
+            inst["staff"],
+            inst["calendar"],
+            inst["penalty"],
+            inst["ng"],
+            50,
+        ),
+        {},
+        {},
+        lambda shift_sch: shift_sch.extract_solution(),
+        None,
+    ),
+    "ShiftScheduler_9": (
+        "ShiftScheduler_9",
+        lambda inst: (inst["staff"], inst["calendar"], inst["penalty"]),
+        {},
+        {"solver": "SCIP"},
+        _cvxpy_extract,
+        "small",
+    ),
+    "ShiftScheduler_9_linear": (
+        "ShiftScheduler_9",
+        lambda inst: (inst["staff"], inst["calendar"], inst["penalty"]),
+        {"objective": "linear"},
+        {"solver": "HIGHS"},
+        _cvxpy_extract,
+        None,
+    ),
+}
+
+
+def make_instance(n_staff, n_days, seed):
+    staff_df, calendar_df, staff_ng_date = generate_instance(n_staff, n_days, seed=seed)
+    staff_penalty = {s: 10 + 10 * (i % 9) for i, s in enumerate(staff_df["スタッフID"])}
+    return {
+        "staff": staff_df,
+        "calendar": calendar_df,
+        "penalty": staff_penalty,
+        "ng": staff_ng_date,
+    }
+
+
+def run_phases(variant, instance, trace_memory):
+    # set_data、build_model、solve、シフト表の作成を順に実行し、それぞれの時間（とピークメモリ）を計測する
+    module_name, set_data_args, build_kwargs, solve_kwargs, extract, _ = VARIANTS[
+        variant
+    ]
+    module = importlib.import_module(f"src.shift_scheduler.{module_name}")
+    shift_sch = module.ShiftScheduler()
+    phases = [
+        ("set_data", lambda: shift_sch.set_data(*set_data_args(instance))),
+        ("build_model", lambda: shift_sch.build_model(**build_kwargs)),
+        ("solve", lambda: shift_sch.solve(**solve_kwargs)),
+        ("extract", lambda: extract(shift_sch)),
+    ]
+    times = {}
+    memory = {}
+    for name, phase in phases:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        phase()
+        times[name] = time.perf_counter() - start
+        if trace_memory:
+            memory[name] = tracemalloc.get_traced_memory()[1] / 1024**2
+            tracemalloc.stop()
+    return shift_sch, times, memory
+
+
+def measure(variant, instance):
+    # tracemallocは実行を遅くするため、時間とメモリは別々の実行で計測する
+    # solveのメモリはPythonで確保した分だけで、別プロセスで動くソルバーのメモリは含まない
+    shift_sch, times, _ = run_phases(variant, instance, trace_memory=False)
+    _, _, memory = run_phases(variant, instance, trace_memory=True)
+
+    # solveの時間にはシフト表の作成が含まれるので、その分を差し引いた時間も記録する
+    times["solve_only"] = max(0.0, times["solve"] - times["extract"])
+    return {
+        "times": times,
+        "peak_memory_mb": memory,
+        "total_shifts": int(np.asarray(shift_sch.sch_df).sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ShiftSchedulerの各段階の時間を計測する"
+    )
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument(
+        "--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS)
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="結果を保存するJSONファイル")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'size':>7} {'variant':>24} {'set_data[s]':>12} {'build[s]':>9} "
+        f"{'solve[s]':>9} {'extract[s]':>11} {'peak[MB]':>9}"
+    )
+    for size in args.sizes:
+        n_staff, n_days = SIZES[size]
+        instance = make_instance(n_staff, n_days, args.seed)
+        for variant in args.variants:
+            max_size = VARIANTS[variant][5]
+            if max_size is not None and list(SIZES).index(size) > list(SIZES).index(
+                max_size
+            ):
+                continue
+            result = measure(variant, instance)
+            results.append(
+                dict(result, size=size, n_staff=n_staff, n_days=n_days, variant=variant)
+            )
+            times = result["times"]
+            print(
+                f"{size:>7} {variant:>24} {times['set_data']:>12.4f} "
+                f"{times['build_model']:>9.4f} {times['solve_only']:>9.3f} "
+                f"{times['extract']:>11.4f} "
+                f"{max(result['peak_memory_mb'].values()):>9.1f}"
+            )
+
+    # 実行環境と一緒にJSONで保存して、後で結果を比べられるようにする
+    now = datetime.datetime.now()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench_suite_{now:%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "created_at": now.isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "seed": args.seed,
+                "results": results,
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print("saved:", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from bench_build_model import DATA_DIR, make_scaled_instance
+from src.shift_scheduler.ShiftScheduler_8_2 import ShiftScheduler
+
+# サンプルデータ(7スタッフ×7日)を複製して約500スタッフ×60日の問題例にする
+STAFF_REP = 72
+DAY_REP = 9
+
+
+def main():
+    staff_df, calendar_df = make_scaled_instance(
+        pd.read_csv(os.path.join(DATA_DIR, "staff.csv")),
+        pd.read_csv(os.path.join(DATA_DIR, "calendar.csv")),
+        STAFF_REP,
+        DAY_REP,
+    )
+    staff_ids = staff_df["スタッフID"].tolist()
+    staff_ng_date = {s: "すべてOK" for s in staff_ids}
+    print(f"instance: {len(staff_df)} staff x {len(calendar_df)} days")
+
+    # 初回はモデルを構築して求解する
+    shift_sch = ShiftScheduler()
+    start = time.perf_counter()
+    shift_sch.set_data(
+        staff_df, calendar_df, {s: 50 for s in staff_ids}, staff_ng_date, 50
+    )
+    shift_sch.build_model()
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    shift_sch.solve()
+    solve_time = time.perf_counter() - start
+
+    # ペナルティを変えて、再構築する場合とモデルを更新する場合を比べる
+    new_penalty = {s: 10 + i % 90 for i, s in enumerate(staff_ids)}
+
+    cold = ShiftScheduler()
+    start = time.perf_counter()
+    cold.set_data(staff_df, calendar_df, new_penalty, staff_ng_date, 30)
+    cold.build_model()
+    cold_build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    cold.solve()
+    cold_solve_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    updated = shift_sch.update_data(
+        staff_df, calendar_df, new_penalty, staff_ng_date, 30
+    )
+    update_time = time.perf_counter() - start
+    start = time.perf_counter()
+    shift_sch.solve()
+    warm_solve_time = time.perf_counter() - start
+
+    print(f"first build: {build_time:.3f}s, solve: {solve_time:.3f}s")
+    print(
+        f"rebuild:     {cold_build_time:.3f}s, solve: {cold_solve_time:.3f}s, "
+        f"total: {cold_build_time + cold_solve_time:.3f}s"
+    )
+    print(
+        f"update:      {update_time:.3f}s, solve: {warm_solve_time:.3f}s, "
+        f"total: {update_time + warm_solve_time:.3f}s (updated in place: {updated})"
+    )
+    print(
+        "objective (rebuild / update):",
+        cold.model.objective.value(),
+        shift_sch.model.objective.value(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from bench_build_model import DATA_DIR, make_scaled_instance
+from src.shift_scheduler.ShiftScheduler_8_2 import ShiftScheduler
+
+STAFF_REP = 30
+DAY_REP = 6
+
+
+def solve(staff_df, calendar_df, staff_penalty, staff_ng_date, initial_schedule=None):
+    shift_sch = ShiftScheduler()
+    shift_sch.set_data(staff_df, calendar_df, staff_penalty, staff_ng_date, 50)
+    shift_sch.build_model()
+    shift_sch.solve(initial_schedule)
+    return shift_sch
+
+
+def main():
+    staff_df, calendar_df = make_scaled_instance(
+        pd.read_csv(os.path.join(DATA_DIR, "staff.csv")),
+        pd.read_csv(os.path.join(DATA_DIR, "calendar.csv")),
+        STAFF_REP,
+        DAY_REP,
+    )
+    staff_ids = staff_df["スタッフID"].tolist()
+    dates = calendar_df["日付"].tolist()
+    staff_ng_date = {s: dates[i % len(dates)] for i, s in enumerate(staff_ids)}
+    print(f"instance: {len(staff_df)} staff x {len(calendar_df)} days")
+
+    # 前回のシフト表を作る
+    staff_penalty = {s: 50 for s in staff_ids}
+    previous = solve(staff_df, calendar_df, staff_penalty, staff_ng_date)
+
+    # 一部のスタッフのペナルティだけを変えて、初期解なしとありで再最適化する
+    edited_penalty = dict(staff_penalty)
+    for s in staff_ids[::10]:
+        edited_penalty[s] = 80
+
+    results = {
+        "cold": solve(staff_df, calendar_df, edited_penalty, staff_ng_date),
+        "warm": solve(
+            staff_df, calendar_df, edited_penalty, staff_ng_date, previous.sch_df
+        ),
+    }
+
+    print(f"{'mode':>5} {'first feasible[s]':>18} {'solve[s]':>9} {'objective':>10}")
+    for mode, shift_sch in results.items():
+        first = shift_sch.time_to_first_feasible
+        print(
+            f"{mode:>5} {'-' if first is None else f'{first:.2f}':>18} "
+            f"{shift_sch.solve_time:>9.2f} {shift_sch.model.objective.value():>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
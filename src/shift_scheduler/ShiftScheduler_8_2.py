@@ -1,6 +1,48 @@
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
 import pulp
 import pandas as pd
 
+try:
+    import resource
+except ImportError:  # Windowsではプロセスの最大メモリ使用量を記録しない
+    resource = None
+
+if __package__:
+    from .model_cache import SLACK_VARIABLES, CompiledModel, structure_key
+    from .preferences import normalize_preferences, preference_index
+    from .summary import ScheduleSummary
+else:
+    # python src/shift_scheduler/ShiftScheduler_8_2.py のように直接実行された場合は、
+    # リポジトリのルートからのパッケージとして読み込む
+    sys.path.append(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    )
+    from src.shift_scheduler.model_cache import (
+        SLACK_VARIABLES,
+        CompiledModel,
+        structure_key,
+    )
+    from src.shift_scheduler.preferences import (
+        normalize_preferences,
+        preference_index,
+    )
+    from src.shift_scheduler.summary import ScheduleSummary
+
+# 初期解とログファイルに対応しているCBC系のソルバー
+CBC_SOLVERS = ("PULP_CBC_CMD", "COIN_CMD")
+
 
 class ShiftScheduler:
     def __init__(self):
@@ -21,49 +63,106 @@ class ShiftScheduler:
         self.y_under = {}  # 各スタッフの希望勤務日数の不足数を表すスラック変数
         self.y_over = {}  # 各スタッフの希望勤務日数の超過数を表すスラック変数
         self.z_over = {}  # 各スタッフの休暇希望の違反数を表すスラック変数
+        self.z_under = {}  # 各スタッフの出勤希望日に出勤しない日数を表すスラック変数
 
         # 数理モデル
         self.model = None
+        self.compiled_model = (
+            None  # モデルキャッシュから読み込んだコンパイル済みのモデル
+        )
+
+        # 変数をスタッフ×日付、またはスタッフの順に並べた配列
+        self.x_array = None
+        self.y_under_array = None
+        self.y_over_array = None
+        self.z_over_array = None
+        self.z_under_array = None
+
+        # 制約（パラメータ更新時に右辺を書き換えるために保持する）
+        self.c_required_staff = {}  # 各日の必要人数の制約
+        self.c_required_leader = {}  # 各日の必要責任者数の制約
+        self.c_min_shift = {}  # 各スタッフの希望最小出勤日数の制約
+        self.c_max_shift = {}  # 各スタッフの希望最大出勤日数の制約
 
         # 最適化結果
         self.status = -1  # 最適化結果のステータス
+        self.sol_status = pulp.LpSolutionNoSolutionFound  # 得られた解の状態
         self.sch_df = None  # シフト表を表すデータフレーム
+        self.solve_time = None  # ソルバーの実行時間（秒）
+        self.time_to_first_feasible = None  # 最初の実行可能解が見つかるまでの時間（秒）
+        self.schedule_array = None  # シフト表の値（スタッフ×日付のuint8の配列）
+        self.slack = {}  # スラック変数の名前 -> スタッフの順に並べた値の配列
+        self.window_results = []  # ローリングホライズンで解いた各期間の結果
+
+        # 計測
+        self.phase_stats = {}  # 各段階の名前 -> 実行時間とメモリ使用量
+        self.profile_cpu = False  # cProfileで関数ごとの実行時間を記録するか
+        self.trace_memory = False  # tracemallocで各段階のピークメモリを記録するか
+        self._profiler = None
 
         # スタッフごとの重みペナルティ、各スタッフについてデフォルトは50として辞書を作成
         self.S2penalty_weight = {s: 50 for s in self.S}
 
-        # 希望休暇の設定
+        # 希望休暇と出勤希望の設定（スタッフ -> 日付のリスト）
         self.S2ng_date = {}
+        self.S2preferred_date = {}
 
-        # 希望休暇のペナルティーの設定
+        # 希望のある（スタッフ, 日付）の組の、スタッフと日付の位置の配列
+        self.ng_index = (np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+        self.preferred_index = self.ng_index
+
+        # 希望休暇と出勤希望のペナルティーの設定
         self.penalty_off = 50
+        self.penalty_preferred = 50
 
     def set_data(
-        self, staff_df, calendar_df, staff_penalty, staff_ng_date, off_penalty
+        self,
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        staff_preferred_date=None,
+        preferred_penalty=None,
     ):
-        # リストの設定
-        self.S = staff_df["スタッフID"].tolist()
-        self.D = calendar_df["日付"].tolist()
-        self.SD = [(s, d) for s in self.S for d in self.D]
+        # staff_ng_date、staff_preferred_dateはスタッフ -> 日付（1つ、リスト、または「すべてOK」）の辞書
+        # preferred_penaltyは出勤希望日に出勤しない場合のペナルティ（省略時はoff_penaltyと同じ）
+        # 計測結果は新しいデータをセットするたびにリセットする
+        self.reset_profile()
+        with self._phase("set_data"):
+            # リストの設定
+            self.S = staff_df["スタッフID"].tolist()
+            self.D = calendar_df["日付"].tolist()
+            self.SD = [(s, d) for s in self.S for d in self.D]
 
-        # 定数の設定
-        S2Dic = staff_df.set_index("スタッフID").to_dict()
-        self.S2leader_flag = S2Dic["責任者フラグ"]
-        self.S2min_shift = S2Dic["希望最小出勤日数"]
-        self.S2max_shift = S2Dic["希望最大出勤日数"]
+            # 定数の設定
+            S2Dic = staff_df.set_index("スタッフID").to_dict()
+            self.S2leader_flag = S2Dic["責任者フラグ"]
+            self.S2min_shift = S2Dic["希望最小出勤日数"]
+            self.S2max_shift = S2Dic["希望最大出勤日数"]
 
-        D2Dic = calendar_df.set_index("日付").to_dict()
-        self.D2required_staff = D2Dic["出勤人数"]
-        self.D2required_leader = D2Dic["責任者人数"]
+            D2Dic = calendar_df.set_index("日付").to_dict()
+            self.D2required_staff = D2Dic["出勤人数"]
+            self.D2required_leader = D2Dic["責任者人数"]
 
-        # スタッフ希望違反のペナルティーの設定
-        self.S2penalty_weight = staff_penalty
+            # スタッフ希望違反のペナルティーの設定
+            self.S2penalty_weight = staff_penalty
 
-        # 希望休暇の設定
-        self.S2ng_date = staff_ng_date
+            # 希望休暇と出勤希望の設定
+            self._set_preferences(staff_ng_date, staff_preferred_date)
 
-        # 休暇希望違反のペナルティーの設定
-        self.penalty_off = off_penalty
+            # 休暇希望違反と出勤希望違反のペナルティーの設定
+            self.penalty_off = off_penalty
+            self.penalty_preferred = (
+                off_penalty if preferred_penalty is None else preferred_penalty
+            )
+
+    def _set_preferences(self, staff_ng_date, staff_preferred_date):
+        # 希望日を日付のリストにそろえ、希望のある組だけの位置の配列を作る
+        self.S2ng_date = normalize_preferences(staff_ng_date, self.S)
+        self.S2preferred_date = normalize_preferences(staff_preferred_date, self.S)
+        self.ng_index = preference_index(self.S2ng_date, self.S, self.D)
+        self.preferred_index = preference_index(self.S2preferred_date, self.S, self.D)
 
     def show(self):
         print("=" * 50)
@@ -79,10 +178,290 @@ class ShiftScheduler:
         print("Date Required Leader:", self.D2required_leader)
 
         print("Staff Penalty Weight:", self.S2penalty_weight)
+        print("NG Dates:", self.S2ng_date)
+        print("Preferred Dates:", self.S2preferred_date)
         print("NG Date Penalty Weight:", self.penalty_off)
+        print("Preferred Date Penalty Weight:", self.penalty_preferred)
         print("=" * 50)
 
     def build_model(self):
+        self.compiled_model = None
+        with self._phase("variables"):
+            ### 数理モデルの定義 ###
+            self.model = pulp.LpProblem("ShiftScheduler", pulp.LpMinimize)
+
+            ### 変数の定義 ###
+            # 各スタッフの各日に対して、シフトに入るなら1、シフトに入らないなら0
+            self.x = pulp.LpVariable.dicts("x", self.SD, cat="Binary")
+
+            # 各スタッフの勤務希望日数の不足数を表すためのスラック変数
+            self.y_under = pulp.LpVariable.dicts(
+                "y_under", self.S, cat="Continuous", lowBound=0
+            )
+
+            # 各スタッフの勤務希望日数の超過数を表すためのスラック変数
+            self.y_over = pulp.LpVariable.dicts(
+                "y_over", self.S, cat="Continuous", lowBound=0
+            )
+            # 各スタッフの休暇希望の違反数を表すためのスラック変数
+            self.z_over = pulp.LpVariable.dicts(
+                "z_over", self.S, cat="Continuous", lowBound=0
+            )
+            # 各スタッフの出勤希望日に出勤しない日数を表すためのスラック変数
+            self.z_under = pulp.LpVariable.dicts(
+                "z_under", self.S, cat="Continuous", lowBound=0
+            )
+
+        with self._phase("coefficients"):
+            ### 係数配列の準備 ###
+            # 変数をスタッフ×日付の配列に並べ、制約は行ごとの変数と係数の配列からまとめて作る
+            n_s, n_d = len(self.S), len(self.D)
+            self._build_variable_arrays()
+            X = self.x_array
+            Y_under = self.y_under_array[:, None]
+            Y_over = self.y_over_array[:, None]
+            Z_over = self.z_over_array[:, None]
+            Z_under = self.z_under_array[:, None]
+
+            leader_flag = np.array([self.S2leader_flag[s] for s in self.S])
+            min_shift = np.array([self.S2min_shift[s] for s in self.S])
+            max_shift = np.array([self.S2max_shift[s] for s in self.S])
+            required_staff = np.array([self.D2required_staff[d] for d in self.D])
+            required_leader = np.array([self.D2required_leader[d] for d in self.D])
+            penalty_weight = np.array([self.S2penalty_weight[s] for s in self.S])
+
+            ones = np.ones((n_s, n_d), dtype=int)
+            minus_one = -np.ones((n_s, 1), dtype=int)
+
+        ### 制約式の定義 ###
+        with self._phase("constraints: required_staff"):
+            # 各日に対して、必要な人数がシフトに入る
+            self.c_required_staff = dict(
+                zip(
+                    self.D,
+                    self._add_constraint_rows(
+                        X.T, ones.T, pulp.LpConstraintGE, required_staff
+                    ),
+                )
+            )
+
+        with self._phase("constraints: required_leader"):
+            # 各日に対して、必要なリーダーの人数がシフトに入る
+            self.c_required_leader = dict(
+                zip(
+                    self.D,
+                    self._add_constraint_rows(
+                        X.T, ones.T * leader_flag, pulp.LpConstraintGE, required_leader
+                    ),
+                )
+            )
+
+        with self._phase("objective"):
+            ### 目的関数とスラック変数の定義 ###
+            # 各スタッフの勤務希望日数の不足数、超過数と希望休暇・出勤希望の違反を
+            # 重みペナルティを考慮して最小化する
+            objective_vars = np.hstack([Y_under, Y_over, Z_over, Z_under])
+            objective_coefs = np.column_stack(
+                [
+                    penalty_weight,
+                    penalty_weight,
+                    np.full(n_s, self.penalty_off),
+                    np.full(n_s, self.penalty_preferred),
+                ]
+            )
+            mask = objective_coefs != 0
+            self.model += pulp.LpAffineExpression(
+                zip(objective_vars[mask], objective_coefs[mask].tolist())
+            )
+
+        with self._phase("constraints: min_shift"):
+            # 各スタッフに対して、y_under[s]は勤務希望日数の不足数を表す
+            self.c_min_shift = dict(
+                zip(
+                    self.S,
+                    self._add_constraint_rows(
+                        np.hstack([X, Y_under]),
+                        np.hstack([-ones, minus_one]),
+                        pulp.LpConstraintLE,
+                        -min_shift,
+                    ),
+                )
+            )
+
+        with self._phase("constraints: max_shift"):
+            # 各スタッフに対して、y_over[s]は勤務希望日数の超過数を表す
+            self.c_max_shift = dict(
+                zip(
+                    self.S,
+                    self._add_constraint_rows(
+                        np.hstack([X, Y_over]),
+                        np.hstack([ones, minus_one]),
+                        pulp.LpConstraintLE,
+                        max_shift,
+                    ),
+                )
+            )
+        with self._phase("constraints: ng_date"):
+            # 休暇希望のある各スタッフに対して、z_over[s]は休暇希望の違反数を表す
+            self._add_preference_rows(self.ng_index, self.z_over_array, False)
+
+        with self._phase("constraints: preferred_date"):
+            # 出勤希望のある各スタッフに対して、z_under[s]は出勤希望日に出勤しない日数を表す
+            self._add_preference_rows(self.preferred_index, self.z_under_array, True)
+
+    def build_model_cached(self, model_cache):
+        # 構造が同じモデルがmodel_cache（model_cache.ModelCache）にあれば、PuLPのモデルを作らずに
+        # コンパイル済みのMPSファイルを使い、目的関数の係数と制約の右辺だけを書き換えて解く
+        # なければbuild_modelで作ってからコンパイルし、キャッシュに保存する。キャッシュにあればTrueを返す
+        key = structure_key(self)
+        with self._phase("model_cache"):
+            compiled_model = model_cache.get(key)
+        if compiled_model is not None:
+            self.model = None
+            self.compiled_model = compiled_model
+            return True
+        self.build_model()
+        with self._phase("compile"):
+            compiled_model = CompiledModel.compile(self)
+            model_cache.put(key, compiled_model)
+        self.compiled_model = compiled_model
+        return False
+
+    def _objective_coefficients(self):
+        # スラック変数の種類 -> スタッフの順の目的関数の係数
+        n_s = len(self.S)
+        penalty_weight = np.array([self.S2penalty_weight[s] for s in self.S])
+        return {
+            "y_under": penalty_weight,
+            "y_over": penalty_weight,
+            "z_over": np.full(n_s, self.penalty_off),
+            "z_under": np.full(n_s, self.penalty_preferred),
+        }
+
+    def _rhs_values(self):
+        # 制約の種類 -> 日付またはスタッフの順の右辺の値
+        return {
+            "required_staff": np.array([self.D2required_staff[d] for d in self.D]),
+            "required_leader": np.array([self.D2required_leader[d] for d in self.D]),
+            "min_shift": -np.array([self.S2min_shift[s] for s in self.S]),
+            "max_shift": np.array([self.S2max_shift[s] for s in self.S]),
+        }
+
+    def _add_preference_rows(self, index, slack, preferred):
+        # 希望のある（スタッフ, 日付）の組だけから、スタッフごとに1本の制約を作る
+        # 休暇希望:  希望日のxの和 - slack[s] == 0
+        # 出勤希望:  希望日のxの和 + slack[s] == 希望日の数
+        # 組の数に比例する手間で作れるので、スタッフ×日付の全体を調べる必要はない
+        rows, cols = index
+        order = np.argsort(rows, kind="stable")
+        rows, cols = rows[order], cols[order]
+        staff, starts, counts = np.unique(rows, return_index=True, return_counts=True)
+        sign = 1 if preferred else -1
+        for i, start, count in zip(staff.tolist(), starts.tolist(), counts.tolist()):
+            expr = pulp.LpAffineExpression(
+                [(v, 1) for v in self.x_array[i, cols[start : start + count]]]
+                + [(slack[i], sign)]
+            )
+            self.model.addConstraint(
+                pulp.LpConstraint(
+                    expr, pulp.LpConstraintEQ, rhs=count if preferred else 0
+                )
+            )
+
+    def _add_constraint_rows(self, V, A, sense, rhs):
+        # 変数行列Vと係数行列Aの各行を1本の制約とし、係数0の項を除いてモデルに追加する
+        mask = A != 0
+        constraints = []
+        for v_row, a_row, m_row, b in zip(V, A, mask, rhs.tolist()):
+            expr = pulp.LpAffineExpression(zip(v_row[m_row], a_row[m_row].tolist()))
+            constraint = pulp.LpConstraint(expr, sense, rhs=b)
+            self.model.addConstraint(constraint)
+            constraints.append(constraint)
+        return constraints
+
+    def update_penalty(
+        self, staff_penalty=None, off_penalty=None, preferred_penalty=None
+    ):
+        # 構築済みのモデルの目的関数の係数だけを書き換える
+        objective = self.model.objective
+        if staff_penalty is not None:
+            self.S2penalty_weight = staff_penalty
+            for s in self.S:
+                _set_coefficient(objective, self.y_under[s], staff_penalty[s])
+                _set_coefficient(objective, self.y_over[s], staff_penalty[s])
+        if off_penalty is not None:
+            self.penalty_off = off_penalty
+            for s in self.S:
+                _set_coefficient(objective, self.z_over[s], off_penalty)
+        if preferred_penalty is not None:
+            self.penalty_preferred = preferred_penalty
+            for s in self.S:
+                _set_coefficient(objective, self.z_under[s], preferred_penalty)
+
+    def update_requirements(
+        self, required_staff=None, required_leader=None, min_shift=None, max_shift=None
+    ):
+        # 構築済みのモデルの制約の右辺だけを書き換える
+        if required_staff is not None:
+            self.D2required_staff = required_staff
+            for d in self.D:
+                self.c_required_staff[d].changeRHS(required_staff[d])
+        if required_leader is not None:
+            self.D2required_leader = required_leader
+            for d in self.D:
+                self.c_required_leader[d].changeRHS(required_leader[d])
+        if min_shift is not None:
+            self.S2min_shift = min_shift
+            for s in self.S:
+                self.c_min_shift[s].changeRHS(-min_shift[s])
+        if max_shift is not None:
+            self.S2max_shift = max_shift
+            for s in self.S:
+                self.c_max_shift[s].changeRHS(max_shift[s])
+
+    def update_data(
+        self,
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        staff_preferred_date=None,
+        preferred_penalty=None,
+    ):
+        # モデルの構造（スタッフ、日付、責任者フラグ、休暇希望、出勤希望）が変わっていなければ、
+        # 係数と右辺だけを更新してTrueを返す。構造が変わっていればFalseを返すので、
+        # その場合はset_dataとbuild_modelからやり直す
+        if self.model is None:
+            return False
+        S2Dic = staff_df.set_index("スタッフID").to_dict()
+        D2Dic = calendar_df.set_index("日付").to_dict()
+        if (
+            staff_df["スタッフID"].tolist() != self.S
+            or calendar_df["日付"].tolist() != self.D
+            or S2Dic["責任者フラグ"] != self.S2leader_flag
+            or normalize_preferences(staff_ng_date, self.S) != self.S2ng_date
+            or normalize_preferences(staff_preferred_date, self.S)
+            != self.S2preferred_date
+        ):
+            return False
+
+        with self._phase("update_data"):
+            self.update_penalty(
+                staff_penalty,
+                off_penalty,
+                off_penalty if preferred_penalty is None else preferred_penalty,
+            )
+            self.update_requirements(
+                D2Dic["出勤人数"],
+                D2Dic["責任者人数"],
+                S2Dic["希望最小出勤日数"],
+                S2Dic["希望最大出勤日数"],
+            )
+        return True
+
+    def build_model_loop(self):
+        # 比較用：制約を1本ずつPythonのループで作る従来の実装
         ### 数理モデルの定義 ###
         self.model = pulp.LpProblem("ShiftScheduler", pulp.LpMinimize)
 
@@ -103,6 +482,10 @@ class ShiftScheduler:
         self.z_over = pulp.LpVariable.dicts(
             "z_over", self.S, cat="Continuous", lowBound=0
         )
+        # 各スタッフの出勤希望日に出勤しない日数を表すためのスラック変数
+        self.z_under = pulp.LpVariable.dicts(
+            "z_under", self.S, cat="Continuous", lowBound=0
+        )
 
         ### 制約式の定義 ###
         # 各日に対して、必要な人数がシフトに入る
@@ -126,6 +509,7 @@ class ShiftScheduler:
                 for s in self.S
             ]
             + [self.penalty_off * self.z_over[s] for s in self.S]
+            + [self.penalty_preferred * self.z_under[s] for s in self.S]
         )
 
         # 各スタッフに対して、y_under[s]は勤務希望日数の不足数を表す
@@ -143,21 +527,491 @@ class ShiftScheduler:
             )
         # 各スタッフに対して、z_over[s]は休暇希望の違反数を表す
         for s in self.S:
-            if self.S2ng_date[s] != "すべてOK":
+            if self.S2ng_date[s]:
                 self.model += (
-                    pulp.lpSum(self.x[s, d] for d in self.D if d == self.S2ng_date[s])
+                    pulp.lpSum(self.x[s, d] for d in self.D if d in self.S2ng_date[s])
                     == self.z_over[s]
                 )
+        # 各スタッフに対して、z_under[s]は出勤希望日に出勤しない日数を表す
+        for s in self.S:
+            preferred = [d for d in self.D if d in self.S2preferred_date[s]]
+            if preferred:
+                self.model += pulp.lpSum(
+                    self.x[s, d] for d in preferred
+                ) + self.z_under[s] == len(preferred)
+        self._build_variable_arrays()
+
+    def _build_variable_arrays(self):
+        # 変数をスタッフ×日付（スラック変数はスタッフ）の順に並べた配列を作る
+        # 制約の作成と、解の値の一括読み出しに使う
+        n_s, n_d = len(self.S), len(self.D)
+        self.x_array = _object_array((self.x[sd] for sd in self.SD), n_s * n_d).reshape(
+            n_s, n_d
+        )
+        self.y_under_array = _object_array((self.y_under[s] for s in self.S), n_s)
+        self.y_over_array = _object_array((self.y_over[s] for s in self.S), n_s)
+        self.z_over_array = _object_array((self.z_over[s] for s in self.S), n_s)
+        self.z_under_array = _object_array((self.z_under[s] for s in self.S), n_s)
 
-    def solve(self):
-        solver = pulp.PULP_CBC_CMD(msg=0)
-        self.status = self.model.solve(solver)
+    def set_initial_schedule(self, schedule):
+        # スタッフ×日付の0/1のデータフレームを、各変数の初期値として設定する
+        values = self._initial_values(schedule)
+        for kind, variables in (
+            ("x", self.x_array),
+            ("y_under", self.y_under_array),
+            ("y_over", self.y_over_array),
+            ("z_over", self.z_over_array),
+            ("z_under", self.z_under_array),
+        ):
+            for v, value in zip(variables.ravel(), values[kind].ravel().tolist()):
+                v.setInitialValue(value)
+
+    def _initial_values(self, schedule):
+        # スタッフ×日付の0/1のデータフレームから、変数の種類 -> 初期値の配列を作る
+        # 含まれないスタッフや日付は0とみなし、スラック変数はシフトから決まる値にする
+        X = (
+            schedule.reindex(index=self.S, columns=self.D, fill_value=0)
+            .fillna(0)
+            .to_numpy()
+            .clip(0, 1)
+            .round()
+            .astype(int)
+        )
+        worked = X.sum(axis=1)
+        min_shift = np.array([self.S2min_shift[s] for s in self.S])
+        max_shift = np.array([self.S2max_shift[s] for s in self.S])
+        ng_worked, preferred_missed = self._preference_violations(X)
+        return {
+            "x": X,
+            "y_under": np.maximum(min_shift - worked, 0),
+            "y_over": np.maximum(worked - max_shift, 0),
+            "z_over": np.array(ng_worked),
+            "z_under": np.array(preferred_missed),
+        }
+
+    def _preference_violations(self, X):
+        # スタッフ×日付の0/1の配列から、各スタッフが休暇希望日に出勤する日数と、
+        # 出勤希望日に出勤しない日数を、希望のある組だけを見て数える
+        n_s = len(self.S)
+        rows, cols = self.ng_index
+        ng_worked = np.bincount(rows, weights=X[rows, cols], minlength=n_s)
+        rows, cols = self.preferred_index
+        preferred_missed = np.bincount(rows, weights=1 - X[rows, cols], minlength=n_s)
+        return ng_worked.astype(int).tolist(), preferred_missed.astype(int).tolist()
+
+    def solve(
+        self,
+        initial_schedule=None,
+        threads=None,
+        time_limit=None,
+        gap_rel=None,
+        gap_abs=None,
+        solver_name="PULP_CBC_CMD",
+    ):
+        # initial_scheduleにスタッフ×日付の0/1のデータフレーム（前回のsch_dfなど）を渡すと、
+        # それを初期解(MIP start)としてソルバーに渡す
+        # threadsはソルバーのスレッド数、time_limitは制限時間（秒）、
+        # gap_rel/gap_absは探索を打ち切る相対/絶対ギャップ（Noneなら制限なし）
+        # solver_nameはpulp.listSolvers()で得られるPuLPのソルバー名
+        # build_model_cachedでコンパイル済みのモデルを使う場合は、CBCに直接MPSファイルを渡して解く
+        solver_options = dict(
+            msg=0, threads=threads, timeLimit=time_limit, gapRel=gap_rel, gapAbs=gap_abs
+        )
+        if self.compiled_model is not None and solver_name in CBC_SOLVERS:
+            self._solve_compiled(
+                initial_schedule, pulp.getSolver(solver_name, **solver_options)
+            )
+            return
+        if self.model is None:
+            # コンパイル済みのモデルに対応していないソルバーでは、PuLPのモデルを作って解く
+            self.build_model()
+
+        # CBCの場合は初期解を渡し、最初の実行可能解が見つかった時間を調べるためにログをファイルに出力する
+        log_path = None
+        if solver_name in CBC_SOLVERS:
+            warm_start = initial_schedule is not None
+            if warm_start:
+                self.set_initial_schedule(initial_schedule)
+            log_fd, log_path = tempfile.mkstemp(suffix=".log")
+            os.close(log_fd)
+            solver_options.update(warmStart=warm_start, logPath=log_path)
+        solver = pulp.getSolver(solver_name, **solver_options)
+
+        start = time.perf_counter()
+        try:
+            with self._phase("solver"):
+                self.status = self.model.solve(solver)
+                self.sol_status = self.model.sol_status
+        finally:
+            self.solve_time = time.perf_counter() - start
+            self.time_to_first_feasible = None
+            if log_path is not None:
+                self.time_to_first_feasible = _first_feasible_time(log_path)
+                os.remove(log_path)
 
         print("status:", pulp.LpStatus[self.status])
+        print("solution:", pulp.LpSolution[self.sol_status])
         print("objective:", self.model.objective.value())
+        print("solve time:", self.solve_time)
+        print("time to first feasible:", self.time_to_first_feasible)
+
+        # 制限時間で打ち切られた場合も、それまでに見つかった暫定解からシフト表を作る
+        if not self.has_solution():
+            self.sch_df = None
+            self.schedule_array = None
+            self.slack = {}
+            return
+        with self._phase("extract"):
+            self.extract_solution()
+
+    def _solve_compiled(self, initial_schedule, solver):
+        # 係数と右辺を書き換えたMPSファイルをCBCで解き、解のファイルから変数の値を読み出す
+        # PuLPのモデルを作らず、MPSファイルの書き出しもxの列の部分はコピーするだけで済む
+        paths = [_temp_path(suffix) for suffix in (".mps", ".mst", ".sol", ".log")]
+        mps_path, mst_path, sol_path, log_path = paths
+        args = [solver.path, mps_path]
+        start = time.perf_counter()
+        try:
+            with self._phase("solver"):
+                self.compiled_model.write_mps(
+                    mps_path, self._objective_coefficients(), self._rhs_values()
+                )
+                if initial_schedule is not None:
+                    self.compiled_model.write_initial_solution(
+                        mst_path, self._initial_values(initial_schedule)
+                    )
+                    args += ["-mips", mst_path]
+                if solver.timeLimit is not None:
+                    args += ["-sec", str(solver.timeLimit)]
+                for option in solver.getOptions():
+                    args += ("-" + option).split()
+                args += ["-solve", "-printingOptions", "all", "-solution", sol_path]
+                with open(log_path, "w") as log:
+                    returncode = subprocess.call(
+                        args, stdout=log, stderr=log, stdin=subprocess.DEVNULL
+                    )
+                if returncode != 0 or os.path.getsize(sol_path) == 0:
+                    raise pulp.PulpSolverError(
+                        f"CBCの実行に失敗しました: {solver.path}"
+                    )
+                self.status, self.sol_status = solver.get_status(sol_path)
+            # 制限時間で打ち切られた場合も、それまでに見つかった暫定解からシフト表を作る
+            values = None
+            if self.has_solution():
+                with self._phase("extract"):
+                    values = self.compiled_model.read_solution(sol_path)
+        finally:
+            self.solve_time = time.perf_counter() - start
+            self.time_to_first_feasible = None
+            if os.path.exists(log_path):
+                self.time_to_first_feasible = _first_feasible_time(log_path)
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        print("status:", pulp.LpStatus[self.status])
+        print("solution:", pulp.LpSolution[self.sol_status])
+        print("solve time:", self.solve_time)
+        print("time to first feasible:", self.time_to_first_feasible)
+
+        if values is None:
+            self.sch_df = None
+            self.schedule_array = None
+            self.slack = {}
+            return
+        self._set_solution(values)
+
+    def extract_solution(self):
+        # 変数の値を配列にまとめて読み出し、シフト表とスラック変数の値のベクトルを作る
+        self._set_solution(
+            {
+                "x": _values(self.x_array.ravel()).reshape(self.x_array.shape),
+                "y_under": _values(self.y_under_array),
+                "y_over": _values(self.y_over_array),
+                "z_over": _values(self.z_over_array),
+                "z_under": _values(self.z_under_array),
+            }
+        )
+
+    def _set_solution(self, values):
+        # 変数の種類 -> 値の配列から、シフト表とスラック変数の値のベクトルを作る
+        # シフト表はスタッフ×日付のuint8の配列を、コピーせずにデータフレームにしたもの
+        self.schedule_array = np.rint(values["x"]).astype(np.uint8)
+        self.sch_df = pd.DataFrame(
+            self.schedule_array, index=self.S, columns=self.D, copy=False
+        )
+        self.slack = {kind: values[kind] for kind in SLACK_VARIABLES}
+
+    def solve_rolling_horizon(self, window, step=None, **solve_options):
+        # 日付をwindow日ずつの重なりのある期間に分けて順に解く（ローリングホライズン）
+        # 各期間の先頭step日分（省略時はwindowの半分）のシフトを確定し、次の期間は確定した日の翌日から解く
+        # 希望最小・最大出勤日数は、確定済みの出勤日数を差し引いた残りを、残りの日数に対する
+        # 期間の日数の割合で按分して各期間に割り当てる（最後の期間には残りをすべて割り当てる）
+        # solve_optionsはsolveにそのまま渡す。set_dataの後にbuild_modelをせずに呼び出す
+        if step is None:
+            step = max(1, window // 2)
+        if not 1 <= step <= window:
+            raise ValueError("step must be between 1 and window")
+
+        staff_df = pd.DataFrame(
+            {
+                "スタッフID": self.S,
+                "責任者フラグ": [self.S2leader_flag[s] for s in self.S],
+                "希望最小出勤日数": [self.S2min_shift[s] for s in self.S],
+                "希望最大出勤日数": [self.S2max_shift[s] for s in self.S],
+            }
+        )
+        worked = {s: 0 for s in self.S}
+        committed = []
+        self.model = None
+        # 前回の結果が残らないように、シフト表は最後の期間まで解けたときだけ設定する
+        self.sch_df = None
+        self.schedule_array = None
+        self.slack = {}
+        self.window_results = []
+        self.solve_time = 0.0
+        self.time_to_first_feasible = None
+
+        start = 0
+        while start < len(self.D):
+            dates = self.D[start : start + window]
+            last = start + window >= len(self.D)
+            ratio = 1.0 if last else len(dates) / (len(self.D) - start)
+
+            sub = ShiftScheduler()
+            sub.set_data(
+                staff_df,
+                pd.DataFrame(
+                    {
+                        "日付": dates,
+                        "出勤人数": [self.D2required_staff[d] for d in dates],
+                        "責任者人数": [self.D2required_leader[d] for d in dates],
+                    }
+                ),
+                self.S2penalty_weight,
+                self.S2ng_date,
+                self.penalty_off,
+                self.S2preferred_date,
+                self.penalty_preferred,
+            )
+            sub.S2min_shift = {
+                s: max(0, self.S2min_shift[s] - worked[s]) * ratio for s in self.S
+            }
+            sub.S2max_shift = {
+                s: max(0, self.S2max_shift[s] - worked[s]) * ratio for s in self.S
+            }
+            sub.build_model()
+            sub.solve(**solve_options)
+
+            self.status = sub.status
+            self.sol_status = sub.sol_status
+            self.solve_time += sub.solve_time
+            self.window_results.append(
+                {
+                    "start": dates[0],
+                    "end": dates[-1],
+                    "status": pulp.LpStatus[sub.status],
+                    "solution_status": pulp.LpSolution[sub.sol_status],
+                    "objective": (
+                        sub.model.objective.value() if sub.has_solution() else None
+                    ),
+                    "solve_time": sub.solve_time,
+                }
+            )
+            if not sub.has_solution():
+                self.sch_df = None
+                self.schedule_array = None
+                return
+
+            # 最後の期間はすべて確定し、それ以外は先頭step日分だけを確定する
+            fixed = sub.sch_df if last else sub.sch_df.iloc[:, :step]
+            committed.append(fixed)
+            for s, n in fixed.sum(axis=1).items():
+                worked[s] += n
+            start += len(fixed.columns)
+
+        self.sch_df = pd.concat(committed, axis=1)
+        self.schedule_array = self.sch_df.to_numpy()
+        # 期間ごとの最適解をつないだものなので、全体としての最適性は保証されない
+        self.sol_status = pulp.LpSolutionIntegerFeasible
+        print("rolling horizon objective:", self.evaluate_objective())
+
+    def evaluate_objective(self, schedule=None):
+        # シフト表（省略時は最適化結果）に対する目的関数値を計算する
+        if schedule is None:
+            schedule = self.sch_df
+        X = schedule.reindex(index=self.S, columns=self.D, fill_value=0).to_numpy()
+        worked = X.sum(axis=1)
+        min_shift = np.array([self.S2min_shift[s] for s in self.S])
+        max_shift = np.array([self.S2max_shift[s] for s in self.S])
+        penalty_weight = np.array([self.S2penalty_weight[s] for s in self.S])
+        deviation = np.maximum(min_shift - worked, 0) + np.maximum(
+            worked - max_shift, 0
+        )
+        ng_worked, preferred_missed = self._preference_violations(X)
+        return float(
+            penalty_weight @ deviation
+            + self.penalty_off * sum(ng_worked)
+            + self.penalty_preferred * sum(preferred_missed)
+        )
+
+    def enable_profiling(self, cpu=False, memory=False):
+        # cProfileとtracemallocによる計測を有効にする（計算が遅くなるので、必要なときだけ使う）
+        self.profile_cpu = cpu
+        self.trace_memory = memory
+        self._profiler = cProfile.Profile() if cpu else None
+
+    def reset_profile(self):
+        self.phase_stats = {}
+        if self.profile_cpu:
+            self._profiler = cProfile.Profile()
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        # ブロックの実行時間とプロセスの最大メモリ使用量を、段階の名前で記録する
+        # tracemallocを有効にしている場合は、その段階で確保したメモリのピークも記録する
+        start_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        if self._profiler is not None:
+            self._profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stat = {"time": time.perf_counter() - start, "max_rss_mb": _max_rss_mb()}
+            if self._profiler is not None:
+                self._profiler.disable()
+            if self.trace_memory:
+                stat["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024**2
+            if start_tracing:
+                tracemalloc.stop()
+            self.phase_stats[name] = stat
+
+    def get_model_stats(self):
+        # 数理モデルの変数の数、制約の数、制約の係数行列の非ゼロ要素の数
+        if self.model is None and self.compiled_model is not None:
+            return dict(self.compiled_model.stats)
+        if self.model is None:
+            return {}
+        return {
+            "variables": self.model.numVariables(),
+            "binary_variables": len(self.x),
+            "constraints": self.model.numConstraints(),
+            "nonzeros": sum(len(c) for c in self.model.constraints.values()),
+        }
+
+    def get_profile_report(self, limit=30):
+        # cProfileの結果を累積時間の順に並べた文字列を返す（計測していなければNone）
+        if self._profiler is None:
+            return None
+        out = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def get_summary(self):
+        # シフト表の集計（各日の充足状況と、各スタッフの希望出勤日数からの乖離）を返す
+        if self.schedule_array is None:
+            return None
+        return ScheduleSummary(
+            self.schedule_array,
+            self.S,
+            self.D,
+            [self.S2leader_flag[s] for s in self.S],
+            [self.D2required_staff[d] for d in self.D],
+            [self.D2required_leader[d] for d in self.D],
+            [self.S2min_shift[s] for s in self.S],
+            [self.S2max_shift[s] for s in self.S],
+            self.S2ng_date,
+            self.S2preferred_date,
+        )
+
+    def has_solution(self):
+        # 最適解または暫定解（実行可能解）が得られているか
+        return self.sol_status in (
+            pulp.LpSolutionOptimal,
+            pulp.LpSolutionIntegerFeasible,
+        )
+
+    def is_optimal(self):
+        return self.sol_status == pulp.LpSolutionOptimal
+
+    def get_result(self):
+        # 最適化結果を、キャッシュや保存に使える辞書にまとめる
+        # ローリングホライズンやコンパイル済みのモデルで解いた場合は、シフト表から目的関数値を計算する
+        # 解が得られていなければ、ソルバーによって変数の値が違うので、目的関数値はNoneにする
+        if not self.has_solution():
+            objective = None
+        elif self.model is not None and self.compiled_model is None:
+            objective = self.model.objective.value()
+        else:
+            objective = self.evaluate_objective()
+        return {
+            "status": pulp.LpStatus[self.status],
+            "solution_status": pulp.LpSolution[self.sol_status],
+            "optimal": self.is_optimal(),
+            "objective": objective,
+            "sch_df": self.sch_df,
+            "slack": self.slack,
+            "summary": self.get_summary(),
+            "solve_time": self.solve_time,
+            "time_to_first_feasible": self.time_to_first_feasible,
+            "phase_stats": dict(self.phase_stats),
+            "model_stats": self.get_model_stats(),
+            "profile_report": self.get_profile_report(),
+        }
+
+
+def _first_feasible_time(log_path):
+    # CBCのログから、最初に整数解（初期解を含む）が得られた時刻を読み取る
+    # 見つからなければNoneを返す
+    last_seconds = 0.0
+    with open(log_path) as f:
+        for line in f:
+            m = re.search(r"([\d.]+) seconds", line)
+            if m:
+                last_seconds = float(m.group(1))
+            if "Integer solution of" in line or "MIPStart provided solution" in line:
+                return last_seconds
+    return None
+
+
+def _max_rss_mb():
+    # プロセスのこれまでの最大メモリ使用量（MB）。取得できない環境ではNone
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrssの単位はLinuxではKB、macOSではバイト
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def _values(variables):
+    # PuLPの変数の配列から、解の値をfloatの配列として読み出す
+    # 目的関数にも制約にも現れない変数（係数0のスラック変数など）は値がないので0とする
+    return np.fromiter(
+        (v.varValue or 0.0 for v in variables), dtype=float, count=len(variables)
+    )
+
+
+def _set_coefficient(expr, var, coef):
+    # 式の中の変数の係数を書き換える
+    # 係数0の項も式に残す（モデルに登録済みの変数が式から消えると、CBCが値を返さずに失敗するため）
+    expr[var] = coef
+
+
+def _temp_path(suffix):
+    # ソルバーとやり取りする一時ファイルのパス（ファイルは作成済み）
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
 
-        Rows = [[int(self.x[s, d].value()) for d in self.D] for s in self.S]
-        self.sch_df = pd.DataFrame(Rows, index=self.S, columns=self.D)
+def _object_array(items, n):
+    # PuLPの変数などのオブジェクトを要素に持つ1次元配列を作る
+    return np.fromiter(items, dtype=object, count=n)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import cvxpy as cp
+import numpy as np
 import pandas as pd
 
 
@@ -22,10 +23,16 @@ class ShiftScheduler:
 
         # 数理モデル
         self.model = None
+        self.prob = None
+        self.objective_mode = "quadratic"  # 目的関数の形式（quadraticまたはlinear）
+        self.breakpoints = []  # 区分線形近似の折れ点
+        self.q = None  # 区分線形近似した二乗の値を表す変数
 
         # 最適化結果
         self.status = -1  # 最適化結果のステータス
         self.sch_df = None  # シフト表を表すデータフレーム
+        self.compile_time = None  # CVXPYが問題を変換するのにかかった時間（秒）
+        self.solve_time = None  # ソルバーの実行時間（秒）
 
         # スタッフごとの重みペナルティ、各スタッフについてデフォルトは50として辞書を作成
         self.S2penalty_weight = {s: 50 for s in self.S}
@@ -65,60 +72,157 @@ class ShiftScheduler:
         print("Staff Penalty Weight:", self.S2penalty_weight)
         print("=" * 50)
 
-    def build_model(self):
+    def build_model(self, objective="quadratic", breakpoints=None):
+        # objectiveが"quadratic"なら重み付き不足・超過日数の二乗和を最小化する（混合整数二次計画）
+        # "linear"なら二乗を区分線形関数で近似して、混合整数線形計画として解く
+        # breakpointsは区分線形近似の折れ点となる不足・超過日数のリスト
+        # （Noneなら0から取りうる最大日数までのすべての整数で、整数解に対しては二乗と一致する）
+        if objective not in ("quadratic", "linear"):
+            raise ValueError(f"unknown objective: {objective}")
+        self.objective_mode = objective
+
         # 変数の定義
         self.x = cp.Variable((len(self.S), len(self.D)), boolean=True)
         self.y_under = cp.Variable(len(self.S), nonneg=True)
         self.y_over = cp.Variable(len(self.S), nonneg=True)
 
-        # 制約条件の定義
-        constraints = []
+        # パラメータの定義
+        # 値だけを変えて解き直すときは、CVXPYの問題の変換(canonicalization)が再利用される
+        self.p_required_staff = cp.Parameter(len(self.D))  # 各日の必要人数
+        self.p_required_leader = cp.Parameter(len(self.D))  # 各日の必要責任者数
+        self.p_min_shift = cp.Parameter(len(self.S))  # 各スタッフの希望最小出勤日数
+        self.p_max_shift = cp.Parameter(len(self.S))  # 各スタッフの希望最大出勤日数
+        # 各スタッフの重みペナルティとその二乗
+        self.p_penalty_weight = cp.Parameter(len(self.S), nonneg=True)
+        self.p_penalty_weight_sq = cp.Parameter(len(self.S), nonneg=True)
+        self.update_requirements(
+            self.D2required_staff,
+            self.D2required_leader,
+            self.S2min_shift,
+            self.S2max_shift,
+        )
+        self.update_penalty(self.S2penalty_weight)
 
-        # 各日の必要人数制約
-        for d in range(len(self.D)):
-            constraints.append(cp.sum(self.x[:, d]) >= self.D2required_staff[self.D[d]])
+        leader_flag = np.array([self.S2leader_flag[s] for s in self.S])
+        worked = cp.sum(self.x, axis=1)  # 各スタッフの出勤日数
 
-        # 各日の必要責任者数制約
-        for d in range(len(self.D)):
-            constraints.append(
-                cp.sum(
-                    cp.multiply(self.x[:, d], [self.S2leader_flag[s] for s in self.S])
-                )
-                >= self.D2required_leader[self.D[d]]
-            )
-
-        # 各スタッフの勤務日数制約
-        for s in range(len(self.S)):
-            constraints.append(
-                self.S2min_shift[self.S[s]] - cp.sum(self.x[s, :]) <= self.y_under[s]
-            )
-            constraints.append(
-                cp.sum(self.x[s, :]) - self.S2max_shift[self.S[s]] <= self.y_over[s]
-            )
+        # 制約条件の定義
+        constraints = [
+            # 各日の必要人数制約
+            cp.sum(self.x, axis=0) >= self.p_required_staff,
+            # 各日の必要責任者数制約
+            self.x.T @ leader_flag >= self.p_required_leader,
+            # 各スタッフの勤務日数制約
+            self.p_min_shift - worked <= self.y_under,
+            worked - self.p_max_shift <= self.y_over,
+        ]
 
         # 目的関数の定義
-        objective = cp.Minimize(
-            cp.sum_squares(
-                cp.multiply(
-                    [self.S2penalty_weight[s] for s in self.S],
-                    (self.y_under + self.y_over),
+        if objective == "quadratic":
+            objective = cp.Minimize(
+                cp.sum_squares(
+                    cp.multiply(self.p_penalty_weight, (self.y_under + self.y_over))
                 )
             )
-        )
+        else:
+            # 不足・超過日数tの二乗を、折れ点を結ぶ線分の最大値q >= (b_k + b_k+1) t - b_k b_k+1 で表す
+            if breakpoints is None:
+                max_deviation = max([len(self.D)] + list(self.S2min_shift.values()))
+                breakpoints = range(int(max_deviation) + 1)
+            self.breakpoints = sorted(set(breakpoints))
+            if len(self.breakpoints) < 2:
+                raise ValueError("breakpoints must contain at least two values")
+            self.q = cp.Variable(len(self.S), nonneg=True)
+            deviation = self.y_under + self.y_over
+            for b0, b1 in zip(self.breakpoints[:-1], self.breakpoints[1:]):
+                constraints.append(self.q >= (b0 + b1) * deviation - b0 * b1)
+            objective = cp.Minimize(self.p_penalty_weight_sq @ self.q)
 
         # 問題の定義
         self.prob = cp.Problem(objective, constraints)
 
-    def solve(self):
-        self.prob.solve()
+    def update_penalty(self, staff_penalty):
+        # 構築済みの問題のペナルティのパラメータだけを書き換える
+        self.S2penalty_weight = staff_penalty
+        self.p_penalty_weight.value = _vector(staff_penalty, self.S)
+        self.p_penalty_weight_sq.value = self.p_penalty_weight.value**2
+
+    def update_requirements(
+        self, required_staff=None, required_leader=None, min_shift=None, max_shift=None
+    ):
+        # 構築済みの問題の必要人数と希望出勤日数のパラメータだけを書き換える
+        if required_staff is not None:
+            self.D2required_staff = required_staff
+            self.p_required_staff.value = _vector(required_staff, self.D)
+        if required_leader is not None:
+            self.D2required_leader = required_leader
+            self.p_required_leader.value = _vector(required_leader, self.D)
+        if min_shift is not None:
+            self.S2min_shift = min_shift
+            self.p_min_shift.value = _vector(min_shift, self.S)
+        if max_shift is not None:
+            self.S2max_shift = max_shift
+            self.p_max_shift.value = _vector(max_shift, self.S)
+
+    def update_data(self, staff_df, calendar_df, staff_penalty):
+        # スタッフ、日付、責任者フラグが変わっていなければパラメータだけを更新してTrueを返す
+        # 変わっていればFalseを返すので、set_dataとbuild_modelからやり直す
+        if self.prob is None:
+            return False
+        S2Dic = staff_df.set_index("スタッフID").to_dict()
+        D2Dic = calendar_df.set_index("日付").to_dict()
+        if (
+            staff_df["スタッフID"].tolist() != self.S
+            or calendar_df["日付"].tolist() != self.D
+            or S2Dic["責任者フラグ"] != self.S2leader_flag
+        ):
+            return False
+
+        self.update_penalty(staff_penalty)
+        self.update_requirements(
+            D2Dic["出勤人数"],
+            D2Dic["責任者人数"],
+            S2Dic["希望最小出勤日数"],
+            S2Dic["希望最大出勤日数"],
+        )
+        return True
+
+    def solve(self, solver=None, **solver_options):
+        # solverとsolver_optionsはCVXPYのProblem.solveにそのまま渡す
+        # 前回の結果が残らないように、最適解が得られなかった場合はシフト表をNoneにする
+        self.sch_df = None
+        self.compile_time = None
+        self.solve_time = None
+        self.prob.solve(solver=solver, **solver_options)
+
+        # 問題の変換にかかった時間とソルバーの実行時間
+        self.compile_time = self.prob.compilation_time
+        self.solve_time = self.prob.solver_stats.solve_time
 
         if self.prob.status == cp.OPTIMAL:
             print("Optimal value:", self.prob.value)
             self.sch_df = pd.DataFrame(
-                self.x.value.astype(int), index=self.S, columns=self.D
+                self.x.value.round().astype(int), index=self.S, columns=self.D
             )
         else:
             print("Problem status:", self.prob.status)
+        print("compile time:", self.compile_time)
+        print("solve time:", self.solve_time)
+
+    def evaluate_quadratic_objective(self, schedule=None):
+        # シフト表（省略時は最適化結果）に対する、重み付き不足・超過日数の二乗和を計算する
+        # 区分線形近似で解いた結果を、元の二次の目的関数で評価するために使う
+        if schedule is None:
+            schedule = self.sch_df
+        worked = schedule.loc[self.S, self.D].to_numpy().sum(axis=1)
+        deviation = np.maximum(_vector(self.S2min_shift, self.S) - worked, 0)
+        deviation += np.maximum(worked - _vector(self.S2max_shift, self.S), 0)
+        return float(np.sum((_vector(self.S2penalty_weight, self.S) * deviation) ** 2))
+
+
+def _vector(values, keys):
+    # 辞書の値をキーの順に並べたベクトルにする
+    return np.array([values[k] for k in keys], dtype=float)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,311 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pulp
+
+from .model_cache import ModelCache
+from .preferences import preference_index
+from .ShiftScheduler_8_2 import ShiftScheduler
+from .summary import ScheduleSummary
+
+# CVXPYのステータスを、PuLPと同じ形式の結果に変換するための対応表
+CVXPY_STATUS = {
+    "optimal": pulp.LpStatusOptimal,
+    "optimal_inaccurate": pulp.LpStatusOptimal,
+    "infeasible": pulp.LpStatusInfeasible,
+    "infeasible_inaccurate": pulp.LpStatusInfeasible,
+    "unbounded": pulp.LpStatusUnbounded,
+    "unbounded_inaccurate": pulp.LpStatusUnbounded,
+}
+
+
+def make_result(
+    status,
+    sol_status,
+    objective,
+    sch_df,
+    solve_time,
+    time_to_first_feasible=None,
+    phase_stats=None,
+    model_stats=None,
+    profile_report=None,
+    slack=None,
+    summary=None,
+):
+    # すべてのバックエンドで共通の形式の結果を作る（ShiftScheduler.get_resultと同じ形式）
+    return {
+        "status": pulp.LpStatus[status],
+        "solution_status": pulp.LpSolution[sol_status],
+        "optimal": sol_status == pulp.LpSolutionOptimal,
+        "objective": objective,
+        "sch_df": sch_df,
+        "slack": slack or {},
+        "summary": summary,
+        "solve_time": solve_time,
+        "time_to_first_feasible": time_to_first_feasible,
+        "phase_stats": phase_stats or {},
+        "model_stats": model_stats or {},
+        "profile_report": profile_report,
+    }
+
+
+class PulpBackend:
+    def __init__(
+        self, solver_name="PULP_CBC_CMD", model_cache=None, use_model_cache=False
+    ):
+        self.solver_name = solver_name  # PuLPのソルバー名
+        self.shift_sch = None  # 直前に使ったShiftScheduler（モデルの再利用に使う）
+        # コンパイル済みのモデルのキャッシュ（model_cache.ModelCache）。指定すると、構造が同じ問題は
+        # PuLPのモデルを作らずにMPSファイルを書き換えて解く
+        self.model_cache = model_cache
+        # model_cacheを省略してTrueにすると、最初に解くときに既定のディレクトリのキャッシュを作る
+        # （available()で一覧を作るだけなら、キャッシュのディレクトリを作らない）
+        self.use_model_cache = use_model_cache or model_cache is not None
+
+    def available(self):
+        return self.solver_name in pulp.listSolvers(onlyAvailable=True)
+
+    def solve(
+        self,
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        initial_schedule=None,
+        threads=None,
+        time_limit=None,
+        gap_rel=None,
+        gap_abs=None,
+        profile=False,
+        staff_preferred_date=None,
+        preferred_penalty=None,
+    ):
+        # 前回のモデルを更新できればそれを使い、できなければ作り直して最適化する
+        # profileがTrueなら、cProfileとtracemallocで各段階を詳しく計測する
+        if self.shift_sch is not None:
+            self.shift_sch.enable_profiling(cpu=profile, memory=profile)
+            self.shift_sch.reset_profile()
+        data = (
+            staff_df,
+            calendar_df,
+            staff_penalty,
+            staff_ng_date,
+            off_penalty,
+            staff_preferred_date,
+            preferred_penalty,
+        )
+        if self.use_model_cache:
+            if self.model_cache is None:
+                self.model_cache = ModelCache()
+            self.shift_sch = ShiftScheduler()
+            self.shift_sch.enable_profiling(cpu=profile, memory=profile)
+            self.shift_sch.set_data(*data)
+            self.shift_sch.build_model_cached(self.model_cache)
+        elif self.shift_sch is None or not self.shift_sch.update_data(*data):
+            self.shift_sch = ShiftScheduler()
+            self.shift_sch.enable_profiling(cpu=profile, memory=profile)
+            self.shift_sch.set_data(*data)
+            self.shift_sch.build_model()
+        self.shift_sch.solve(
+            initial_schedule,
+            threads=threads,
+            time_limit=time_limit,
+            gap_rel=gap_rel,
+            gap_abs=gap_abs,
+            solver_name=self.solver_name,
+        )
+        return self.shift_sch.get_result()
+
+
+class CvxpyBackend:
+    def __init__(self, solver=None):
+        # CVXPYのソルバー名（Noneならインストールされている混合整数計画ソルバーから選ぶ）
+        self.solver = solver
+
+    def available(self):
+        try:
+            import cvxpy as cp
+        except ImportError:
+            return False
+        return self.solver is None or self.solver in cp.installed_solvers()
+
+    def solve(
+        self,
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        initial_schedule=None,
+        threads=None,
+        time_limit=None,
+        gap_rel=None,
+        gap_abs=None,
+        profile=False,
+        staff_preferred_date=None,
+        preferred_penalty=None,
+    ):
+        # ShiftScheduler_8_2と同じ数理モデルを、CVXPYの行列の式で作って解く
+        # 初期解は使わない（CVXPYはHiGHSに初期解を渡せないため）
+        # スレッド数などの設定は、HiGHSを使う場合だけソルバーに渡す
+        # 計測はモデル構築と求解の時間だけで、profileは使わない
+        import cvxpy as cp
+
+        build_start = time.perf_counter()
+
+        S = staff_df["スタッフID"].tolist()
+        D = calendar_df["日付"].tolist()
+        leader_flag = staff_df["責任者フラグ"].to_numpy()
+        min_shift = staff_df["希望最小出勤日数"].to_numpy()
+        max_shift = staff_df["希望最大出勤日数"].to_numpy()
+        required_staff = calendar_df["出勤人数"].to_numpy()
+        required_leader = calendar_df["責任者人数"].to_numpy()
+        penalty_weight = np.array([staff_penalty[s] for s in S])
+        if preferred_penalty is None:
+            preferred_penalty = off_penalty
+        # 希望のある（スタッフ, 日付）の組の位置と、組をスタッフごとに合計する疎行列
+        ng_rows, ng_cols = preference_index(staff_ng_date, S, D)
+        preferred_rows, preferred_cols = preference_index(
+            staff_preferred_date or {}, S, D
+        )
+        ng_sum = _group_matrix(ng_rows, len(S))
+        preferred_sum = _group_matrix(preferred_rows, len(S))
+
+        x = cp.Variable((len(S), len(D)), boolean=True)
+        y_under = cp.Variable(len(S), nonneg=True)
+        y_over = cp.Variable(len(S), nonneg=True)
+        z_over = cp.Variable(len(S), nonneg=True)
+        z_under = cp.Variable(len(S), nonneg=True)
+
+        worked = cp.sum(x, axis=1)
+        constraints = [
+            cp.sum(x, axis=0) >= required_staff,
+            leader_flag @ x >= required_leader,
+            min_shift - worked <= y_under,
+            worked - max_shift <= y_over,
+        ]
+        if len(ng_rows):
+            has_ng = np.unique(ng_rows)
+            constraints.append((ng_sum @ x[ng_rows, ng_cols])[has_ng] == z_over[has_ng])
+        if len(preferred_rows):
+            has_preferred = np.unique(preferred_rows)
+            n_preferred = np.bincount(preferred_rows, minlength=len(S))
+            constraints.append(
+                (preferred_sum @ x[preferred_rows, preferred_cols] + z_under)[
+                    has_preferred
+                ]
+                == n_preferred[has_preferred]
+            )
+        objective = cp.Minimize(
+            penalty_weight @ (y_under + y_over)
+            + off_penalty * cp.sum(z_over)
+            + preferred_penalty * cp.sum(z_under)
+        )
+        prob = cp.Problem(objective, constraints)
+
+        solver_options = {}
+        if self.solver == "HIGHS":
+            solver_options = {
+                k: v
+                for k, v in dict(
+                    threads=threads,
+                    time_limit=time_limit,
+                    mip_rel_gap=gap_rel,
+                    mip_abs_gap=gap_abs,
+                ).items()
+                if v is not None
+            }
+        start = time.perf_counter()
+        build_time = start - build_start
+        prob.solve(solver=self.solver, **solver_options)
+        solve_time = time.perf_counter() - start
+        phase_stats = {
+            "build_model": {"time": build_time},
+            "solver": {"time": solve_time},
+        }
+        model_stats = {
+            "variables": sum(v.size for v in prob.variables()),
+            "binary_variables": x.size,
+            "constraints": sum(c.size for c in prob.constraints),
+        }
+
+        status = CVXPY_STATUS.get(prob.status, pulp.LpStatusNotSolved)
+        if x.value is None:
+            return make_result(
+                status,
+                pulp.LpSolutionNoSolutionFound,
+                None,
+                None,
+                solve_time,
+                phase_stats=phase_stats,
+                model_stats=model_stats,
+            )
+        sol_status = (
+            pulp.LpSolutionOptimal
+            if prob.status == cp.OPTIMAL
+            else pulp.LpSolutionIntegerFeasible
+        )
+        sch_df = pd.DataFrame(
+            np.rint(x.value).astype(np.uint8), index=S, columns=D, copy=False
+        )
+        slack = {
+            "y_under": y_under.value,
+            "y_over": y_over.value,
+            "z_over": z_over.value,
+            "z_under": z_under.value,
+        }
+        return make_result(
+            status,
+            sol_status,
+            prob.value,
+            sch_df,
+            solve_time,
+            phase_stats=phase_stats,
+            model_stats=model_stats,
+            slack=slack,
+            summary=ScheduleSummary(
+                sch_df.to_numpy(),
+                S,
+                D,
+                leader_flag,
+                required_staff,
+                required_leader,
+                min_shift,
+                max_shift,
+                staff_ng_date,
+                staff_preferred_date or {},
+            ),
+        )
+
+
+def _group_matrix(rows, n_staff):
+    # 希望のある組の値をスタッフごとに合計するための、スタッフ×組の疎行列
+    # SciPyはCVXPYの依存パッケージなので、CVXPYのバックエンドを使うときだけ読み込む
+    import scipy.sparse as sp
+
+    return sp.csr_matrix(
+        (np.ones(len(rows)), (rows, np.arange(len(rows)))), shape=(n_staff, len(rows))
+    )
+
+
+# 利用できるバックエンドの一覧（名前 -> バックエンドを作る関数）
+BACKENDS = {
+    "pulp_cbc": lambda: PulpBackend("PULP_CBC_CMD"),
+    "pulp_cbc_cached": lambda: PulpBackend("PULP_CBC_CMD", use_model_cache=True),
+    "pulp_highs": lambda: PulpBackend("HiGHS"),
+    "cvxpy_highs": lambda: CvxpyBackend("HIGHS"),
+    "cvxpy": lambda: CvxpyBackend(),
+}
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend: {name}")
+    return BACKENDS[name]()
+
+
+def available_backends():
+    # この環境にソルバーがインストールされているバックエンドの名前を返す
+    return [name for name, factory in BACKENDS.items() if factory().available()]
@@ -0,0 +1,343 @@
+import argparse
+import contextlib
+import csv
+import io
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from .backends import BACKENDS, get_backend
+from .cli import (
+    EXIT_NO_SOLUTION,
+    OUTPUT_FORMATS,
+    exit_code,
+    load_inputs,
+    write_schedule,
+)
+from .data_loader import UPLOAD_TYPES
+from .excel_export import result_kpis
+
+# 問題例のディレクトリで探すファイル名（拡張子はdata_loaderが読み込める形式）
+STAFF_NAME = "staff"
+CALENDAR_NAME = "calendar"
+PREFERENCES_FILE = "preferences.csv"
+NG_DATES_FILE = "ng_date.csv"
+
+# 結果の一覧（results.csv）の列
+RESULT_COLUMNS = [
+    "name",
+    "status",
+    "exit_code",
+    "objective",
+    "solve_time",
+    "latency",
+    "output",
+    "error",
+]
+
+
+def find_instances(path):
+    # ディレクトリなら、staff.*とcalendar.*のあるサブディレクトリをそれぞれ1つの問題例にする
+    # CSVファイルなら、name,staff,calendar(,preferences,ng_dates)の列を持つ一覧として読み込む
+    # 一覧のパスは、一覧のファイルのあるディレクトリからの相対パスでもよい
+    if os.path.isdir(path):
+        instances = []
+        for name in sorted(os.listdir(path)):
+            directory = os.path.join(path, name)
+            if not os.path.isdir(directory):
+                continue
+            staff = _find_file(directory, STAFF_NAME)
+            calendar = _find_file(directory, CALENDAR_NAME)
+            if staff is None or calendar is None:
+                continue
+            instances.append(
+                {
+                    "name": name,
+                    "staff": staff,
+                    "calendar": calendar,
+                    "preferences": _optional_file(directory, PREFERENCES_FILE),
+                    "ng_dates": _optional_file(directory, NG_DATES_FILE),
+                }
+            )
+        return instances
+
+    manifest = pd.read_csv(path, dtype=str)
+    missing = {"name", "staff", "calendar"} - set(manifest.columns)
+    if missing:
+        raise ValueError(f"問題例の一覧に列がありません: {sorted(missing)}")
+    base = os.path.dirname(os.path.abspath(path))
+    instances = []
+    for row in manifest.to_dict("records"):
+        instance = {"name": row["name"]}
+        for key in ("staff", "calendar", "preferences", "ng_dates"):
+            value = row.get(key)
+            instance[key] = (
+                None if pd.isna(value) or value == "" else os.path.join(base, value)
+            )
+        instances.append(instance)
+    return instances
+
+
+def run_batch(
+    instances,
+    out_dir,
+    max_workers=None,
+    output_format="csv",
+    backend="pulp_cbc",
+    solver_options=None,
+    penalty=50,
+    off_penalty=50,
+    preferred_penalty=None,
+    on_result=None,
+):
+    # 問題例をプロセスプールで並列に解き、終わったものから順にシフト表とresults.csvの行を書き出す
+    # max_workersは同時に動かすソルバー（CBCのプロセス）の数の上限
+    # solver_optionsはバックエンドのsolveに渡すスレッド数や制限時間などの設定で、
+    # スレッド数を省略すると1にして、max_workers個のCBCがCPUコアを取り合わないようにする
+    # on_resultを渡すと、問題例が1つ終わるたびに結果の辞書を渡して呼び出す
+    # 戻り値は (問題例の順の結果のリスト, 全体の集計の辞書)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(instances) or 1))
+    solver_options = {"threads": 1, **(solver_options or {})}
+    options = {
+        "backend": backend,
+        "solver_options": solver_options,
+        "penalty": penalty,
+        "off_penalty": off_penalty,
+        "preferred_penalty": preferred_penalty,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = [None] * len(instances)
+    start = time.perf_counter()
+    with open(
+        os.path.join(out_dir, "results.csv"), "w", newline="", encoding="utf-8"
+    ) as f, ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=mp.get_context("spawn")
+    ) as executor:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        f.flush()
+        futures = {
+            executor.submit(
+                _solve_instance, instance, out_dir, output_format, options
+            ): i
+            for i, instance in enumerate(instances)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # ワーカープロセスが異常終了した場合など、問題例の中で捕まえられなかったエラー
+                result = _failed(instances[i]["name"], e, 0.0)
+            result["finished_at"] = time.perf_counter() - start
+            results[i] = result
+            writer.writerow({c: result[c] for c in RESULT_COLUMNS})
+            f.flush()
+            if on_result is not None:
+                on_result(result)
+    return results, summarize(results, time.perf_counter() - start)
+
+
+def summarize(results, wall_time):
+    # スループット（1秒あたりに解けた問題例の数）と、問題例ごとのレイテンシの分布をまとめる
+    # 実行不能などでシフト表が得られなかった問題例は、エラーとは別に数える（どちらも成功ではない）
+    latency = np.array([r["latency"] for r in results], dtype=float)
+    failed = [r["name"] for r in results if r["error"] is not None]
+    no_solution = [r["name"] for r in results if r["exit_code"] == EXIT_NO_SOLUTION]
+    summary = {
+        "instances": len(results),
+        "succeeded": len(results) - len(failed) - len(no_solution),
+        "failed": len(failed),
+        "failed_instances": failed,
+        "no_solution": len(no_solution),
+        "no_solution_instances": no_solution,
+        "wall_time": wall_time,
+        "throughput": len(results) / wall_time if wall_time > 0 else None,
+    }
+    if len(latency):
+        summary.update(
+            {
+                "latency_mean": float(latency.mean()),
+                "latency_p50": float(np.percentile(latency, 50)),
+                "latency_p95": float(np.percentile(latency, 95)),
+                "latency_max": float(latency.max()),
+            }
+        )
+    return summary
+
+
+def _solve_instance(instance, out_dir, output_format, options):
+    # ワーカープロセスで1つの問題例を読み込んで解き、シフト表を書き出して、結果の行を返す
+    # 入力データのエラーやソルバーのエラーは、その問題例の失敗として返す
+    start = time.perf_counter()
+    try:
+        inputs = load_inputs(
+            instance["staff"],
+            instance["calendar"],
+            instance.get("preferences"),
+            instance.get("ng_dates"),
+            options["penalty"],
+            None,
+            options["off_penalty"],
+            options["preferred_penalty"],
+        )
+        # ソルバーの途中経過が並列に混ざって出力されないように捨てる
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = get_backend(options["backend"]).solve(
+                **inputs, **options["solver_options"]
+            )
+        output = None
+        if result["sch_df"] is not None:
+            output = os.path.join(out_dir, f"{instance['name']}.{output_format}")
+            write_schedule(output, result, result_kpis(result))
+    except Exception as e:
+        return _failed(instance["name"], e, time.perf_counter() - start)
+    return {
+        "name": instance["name"],
+        "status": result["status"],
+        "exit_code": exit_code(result),
+        "objective": result["objective"],
+        "solve_time": result["solve_time"],
+        "latency": time.perf_counter() - start,
+        "output": output,
+        "error": None,
+    }
+
+
+def _failed(name, error, latency):
+    return {
+        "name": name,
+        "status": "Error",
+        "exit_code": None,
+        "objective": None,
+        "solve_time": None,
+        "latency": latency,
+        "output": None,
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+def _find_file(directory, name):
+    for extension in UPLOAD_TYPES:
+        path = os.path.join(directory, f"{name}.{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _optional_file(directory, name):
+    path = os.path.join(directory, name)
+    return path if os.path.exists(path) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="shift_scheduler.batch",
+        description="多数の店舗の問題例をまとめて並列に解く",
+    )
+    parser.add_argument(
+        "instances",
+        help="問題例のサブディレクトリを持つディレクトリ、または問題例の一覧のCSVファイル",
+    )
+    parser.add_argument("out_dir", help="シフト表とresults.csvを書き出すディレクトリ")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="同時に動かすソルバーの数（省略時はCPUコア数）",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted({f.lstrip(".") for f in OUTPUT_FORMATS}),
+        default="csv",
+        help="シフト表の形式",
+    )
+    parser.add_argument(
+        "--backend", choices=list(BACKENDS), default="pulp_cbc", help="ソルバー"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=1, help="1つのソルバーのスレッド数"
+    )
+    parser.add_argument("--time-limit", type=float, default=None, help="制限時間（秒）")
+    parser.add_argument(
+        "--gap-rel", type=float, default=None, help="探索を打ち切る相対ギャップ"
+    )
+    parser.add_argument(
+        "--gap-abs", type=float, default=None, help="探索を打ち切る絶対ギャップ"
+    )
+    parser.add_argument(
+        "--penalty", type=int, default=50, help="希望出勤日数からの乖離のペナルティ"
+    )
+    parser.add_argument(
+        "--off-penalty", type=int, default=50, help="休暇希望日に出勤するペナルティ"
+    )
+    parser.add_argument(
+        "--preferred-penalty",
+        type=int,
+        default=None,
+        help="出勤希望日に出勤しないペナルティ（省略時は--off-penaltyの値）",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        instances = find_instances(args.instances)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"問題例の一覧を読み込めませんでした: {e}", file=sys.stderr)
+        return 1
+
+    def on_result(result):
+        print(
+            f"{result['name']}: {result['status']} "
+            f"objective={result['objective']} latency={result['latency']:.2f}s"
+            + (f" error={result['error']}" if result["error"] else ""),
+            file=sys.stderr,
+        )
+
+    _, summary = run_batch(
+        instances,
+        args.out_dir,
+        max_workers=args.workers,
+        output_format=args.format,
+        backend=args.backend,
+        solver_options={
+            "threads": args.threads,
+            "time_limit": args.time_limit,
+            "gap_rel": args.gap_rel,
+            "gap_abs": args.gap_abs,
+        },
+        penalty=args.penalty,
+        off_penalty=args.off_penalty,
+        preferred_penalty=args.preferred_penalty,
+        on_result=on_result,
+    )
+    print(
+        f"{summary['succeeded']}/{summary['instances']} instances in "
+        f"{summary['wall_time']:.2f}s ({summary['throughput'] or 0:.2f} instances/s)",
+        file=sys.stderr,
+    )
+    if summary["instances"]:
+        print(
+            f"latency: mean {summary['latency_mean']:.2f}s, "
+            f"p50 {summary['latency_p50']:.2f}s, p95 {summary['latency_p95']:.2f}s, "
+            f"max {summary['latency_max']:.2f}s",
+            file=sys.stderr,
+        )
+    if summary["failed"]:
+        print(f"failed: {summary['failed_instances']}", file=sys.stderr)
+    if summary["no_solution"]:
+        print(f"no solution: {summary['no_solution_instances']}", file=sys.stderr)
+    if summary["failed"] or summary["no_solution"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+from .backends import BACKENDS, get_backend
+from .data_loader import load_calendar, load_staff
+from .excel_export import result_kpis, write_schedule_excel
+from .preferences import read_preferences
+
+# 終了コード（cronなどから結果を判定できるように、状態ごとに分ける。2はargparseの引数エラー）
+EXIT_OPTIMAL = 0  # 最適解が得られた
+EXIT_INPUT_ERROR = 1  # 入力ファイルが読み込めない、または内容に問題がある
+EXIT_FEASIBLE = 3  # 制限時間などで打ち切られたが、実行可能解は得られた
+EXIT_NO_SOLUTION = 4  # 実行不能などで解が得られなかった
+EXIT_SOLVER_ERROR = (
+    5  # ソルバーがインストールされていない、または実行中にエラーになった
+)
+EXIT_OUTPUT_ERROR = 6  # シフト表やKPIを書き出せなかった
+
+# 出力ファイルの拡張子 -> 形式
+OUTPUT_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".json": "json",
+    ".xlsx": "excel",
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="shift_scheduler",
+        description="スタッフ情報とカレンダー情報からシフト表を作る",
+    )
+    parser.add_argument(
+        "staff", help="スタッフ情報のファイル（CSV、Excel、Parquetなど）"
+    )
+    parser.add_argument("calendar", help="カレンダー情報のファイル")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="シフト表の出力先（拡張子で.csv、.parquet、.json、.xlsxを選ぶ。"
+        "省略時は書き出さない）",
+    )
+    parser.add_argument(
+        "--kpi",
+        help="KPIの出力先（.jsonか.csv。省略時は標準出力にJSONで書き出す）",
+    )
+    parser.add_argument(
+        "--preferences",
+        help="「スタッフID,日付,種類」の形式の休暇希望日・出勤希望日のファイル",
+    )
+    parser.add_argument(
+        "--ng-dates",
+        help="「スタッフID,休暇希望日」の形式の休暇希望日のファイル（1人1日）",
+    )
+    parser.add_argument(
+        "--penalty", type=int, default=50, help="希望出勤日数からの乖離のペナルティ"
+    )
+    parser.add_argument(
+        "--penalty-file",
+        help="「スタッフID,ペナルティ」の形式のスタッフごとのペナルティのファイル"
+        "（載っていないスタッフは--penaltyの値）",
+    )
+    parser.add_argument(
+        "--off-penalty", type=int, default=50, help="休暇希望日に出勤するペナルティ"
+    )
+    parser.add_argument(
+        "--preferred-penalty",
+        type=int,
+        default=None,
+        help="出勤希望日に出勤しないペナルティ（省略時は--off-penaltyの値）",
+    )
+    parser.add_argument(
+        "--backend", choices=list(BACKENDS), default="pulp_cbc", help="ソルバー"
+    )
+    parser.add_argument("--time-limit", type=float, default=None, help="制限時間（秒）")
+    parser.add_argument("--threads", type=int, default=None, help="スレッド数")
+    parser.add_argument(
+        "--gap-rel", type=float, default=None, help="探索を打ち切る相対ギャップ"
+    )
+    parser.add_argument(
+        "--gap-abs", type=float, default=None, help="探索を打ち切る絶対ギャップ"
+    )
+    return parser
+
+
+def load_inputs(
+    staff,
+    calendar,
+    preferences=None,
+    ng_dates=None,
+    penalty=50,
+    penalty_file=None,
+    off_penalty=50,
+    preferred_penalty=None,
+):
+    # 指定されたファイルを読み込み、バックエンドのsolveに渡す引数の辞書を返す
+    staff_df = load_staff(staff)
+    calendar_df = load_calendar(calendar)
+    staff_ids = staff_df["スタッフID"].tolist()
+
+    staff_penalty = {s: penalty for s in staff_ids}
+    if penalty_file:
+        penalty_df = pd.read_csv(penalty_file, dtype={"スタッフID": str})
+        staff_penalty.update(
+            zip(penalty_df["スタッフID"], penalty_df["ペナルティ"].astype(int).tolist())
+        )
+
+    staff_ng_date, staff_preferred_date = {}, {}
+    if ng_dates:
+        ng_df = pd.read_csv(ng_dates, dtype=str)
+        staff_ng_date = dict(zip(ng_df["スタッフID"], ng_df["休暇希望日"]))
+    if preferences:
+        ng_date, staff_preferred_date = read_preferences(preferences)
+        staff_ng_date.update(ng_date)
+
+    return {
+        "staff_df": staff_df,
+        "calendar_df": calendar_df,
+        "staff_penalty": staff_penalty,
+        "staff_ng_date": staff_ng_date,
+        "off_penalty": off_penalty,
+        "staff_preferred_date": staff_preferred_date,
+        "preferred_penalty": preferred_penalty,
+    }
+
+
+def write_schedule(path, result, kpis):
+    sch_df = result["sch_df"]
+    fmt = _output_format(path)
+    if fmt == "csv":
+        sch_df.to_csv(path)
+    elif fmt == "parquet":
+        sch_df.to_parquet(path)
+    elif fmt == "json":
+        sch_df.to_json(path, orient="index", force_ascii=False, indent=2)
+    else:
+        write_schedule_excel(path, sch_df, result["summary"], kpis)
+
+
+def write_kpis(path, kpis):
+    if path is None:
+        json.dump(kpis, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    elif os.path.splitext(path)[1].lower() == ".csv":
+        pd.Series(kpis, name="値").rename_axis("項目").to_csv(path)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(kpis, f, ensure_ascii=False, indent=2)
+
+
+def exit_code(result):
+    if result["optimal"]:
+        return EXIT_OPTIMAL
+    if result["sch_df"] is not None:
+        return EXIT_FEASIBLE
+    return EXIT_NO_SOLUTION
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.output:
+        try:
+            _output_format(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        inputs = load_inputs(
+            args.staff,
+            args.calendar,
+            args.preferences,
+            args.ng_dates,
+            args.penalty,
+            args.penalty_file,
+            args.off_penalty,
+            args.preferred_penalty,
+        )
+    except (OSError, KeyError, ValueError) as e:
+        print(f"入力データを読み込めませんでした: {e}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+
+    backend = get_backend(args.backend)
+    if not backend.available():
+        print(f"ソルバーがインストールされていません: {args.backend}", file=sys.stderr)
+        return EXIT_SOLVER_ERROR
+    # ソルバーの途中経過は標準エラー出力に出し、標準出力はKPIのJSONだけにする
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = backend.solve(
+                **inputs,
+                threads=args.threads,
+                time_limit=args.time_limit,
+                gap_rel=args.gap_rel,
+                gap_abs=args.gap_abs,
+            )
+    except Exception as e:
+        print(f"ソルバーの実行中にエラーが発生しました: {e}", file=sys.stderr)
+        return EXIT_SOLVER_ERROR
+
+    kpis = result_kpis(result)
+    kpis["バックエンド"] = args.backend
+    kpis["終了コード"] = exit_code(result)
+    try:
+        if args.output and result["sch_df"] is not None:
+            write_schedule(args.output, result, kpis)
+        write_kpis(args.kpi, kpis)
+    except (OSError, ImportError, ValueError) as e:
+        # 書き込めないパスや、Parquetのライブラリがない場合など
+        print(f"結果を書き出せませんでした: {e}", file=sys.stderr)
+        return EXIT_OUTPUT_ERROR
+    return kpis["終了コード"]
+
+
+def _output_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in OUTPUT_FORMATS:
+        raise ValueError(f"出力ファイルの拡張子に対応していません: {extension}")
+    return OUTPUT_FORMATS[extension]
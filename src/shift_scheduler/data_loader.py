@@ -0,0 +1,244 @@
+import datetime
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# pyarrowがあれば、大きなCSVのパースにも使う（Cのパーサーより速いが、小さなファイルでは起動の分だけ遅い）
+PYARROW_CSV_MIN_BYTES = 1024**2
+try:
+    import pyarrow  # noqa: F401
+
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# 入力データの列と型。IDと日付は文字列、人数や日数は値の範囲に合わせた小さい整数型にする
+STAFF_SCHEMA = {
+    "スタッフID": "str",
+    "責任者フラグ": "int8",
+    "希望最小出勤日数": "int16",
+    "希望最大出勤日数": "int16",
+}
+CALENDAR_SCHEMA = {
+    "日付": "str",
+    "出勤人数": "int32",
+    "責任者人数": "int32",
+}
+
+# Parquet、Arrow（Feather）として読み込むファイルの拡張子と、ファイルの先頭のバイト列
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+UPLOAD_TYPES = ["csv", "xlsx", "parquet", "pq", "arrow", "feather", "ipc"]
+
+# 読み込んだデータフレームを、ファイルの内容のハッシュ値ごとに保持する数
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_staff(source):
+    # スタッフ情報を読み込み、型をそろえて検証したデータフレームを返す
+    # 内容に問題があれば、見つかった問題をすべて含むValueErrorを送出する
+    return _load(source, STAFF_SCHEMA, _validate_staff)
+
+
+def load_calendar(source):
+    # カレンダー情報を読み込み、型をそろえて検証したデータフレームを返す
+    return _load(source, CALENDAR_SCHEMA, _validate_calendar)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _load(source, schema, validate):
+    # 同じ内容のファイルは、パースと検証をせずに前回の結果のコピーを返す
+    data, name = _read_bytes(source)
+    key = (hashlib.sha256(data).hexdigest(), tuple(schema))
+    with _cache_lock:
+        df = _cache.get(key)
+        if df is not None:
+            _cache.move_to_end(key)
+    if df is None:
+        # 型の変換のエラーと内容の検証のエラーを、まとめて1つのValueErrorにする
+        df, errors = _parse(data, name, schema)
+        errors += validate(df)
+        if errors:
+            raise ValueError("\n".join(errors))
+        with _cache_lock:
+            _cache[key] = df
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    # 呼び出し側で書き換えてもキャッシュの内容が変わらないようにコピーを返す
+    return df.copy()
+
+
+def _read_bytes(source):
+    # ファイルのパス、バイト列、Streamlitのアップロードファイルなどから内容とファイル名を取り出す
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(), os.fspath(source)
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source), ""
+    name = getattr(source, "name", "") or ""
+    if hasattr(source, "getvalue"):
+        return source.getvalue(), name
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source.read(), name
+
+
+def _parse(data, name, schema):
+    buffer = io.BytesIO(data)
+    extension = os.path.splitext(name)[1].lower()
+    if extension in PARQUET_EXTENSIONS or data[:4] == b"PAR1":
+        df = pd.read_parquet(buffer)
+    elif extension in ARROW_EXTENSIONS or data[:6] == b"ARROW1":
+        df = pd.read_feather(buffer)
+    elif extension in EXCEL_EXTENSIONS or data[:4] == b"PK\x03\x04":
+        df = _read_excel(buffer, schema)
+    else:
+        # 列名だけ先に確かめて、必要な列だけを型を指定して読み込む
+        header = pd.read_csv(io.BytesIO(data), nrows=0).columns
+        _check_columns(header, schema)
+        df = pd.read_csv(
+            buffer,
+            usecols=list(schema),
+            dtype={c: str for c, t in schema.items() if t == "str"},
+            engine=CSV_ENGINE if len(data) >= PYARROW_CSV_MIN_BYTES else "c",
+        )
+    _check_columns(df.columns, schema)
+    return _convert(df[list(schema)], schema)
+
+
+def _read_excel(buffer, schema):
+    # 最初のシートを1行ずつ読み、必要な列の値だけを集める
+    # read_onlyモードはシート全体をメモリに展開しないので、数千行以上のファイルでもメモリが増えない
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(buffer, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else "" for c in next(rows, ())]
+        _check_columns(header, schema)
+        positions = [header.index(c) for c in schema]
+        columns = {c: [] for c in schema}
+        for row in rows:
+            # 空の行は読み飛ばす（書式だけが残った行がシートの末尾に続くことがある）
+            if row is None or all(v is None for v in row):
+                continue
+            for c, i in zip(schema, positions):
+                columns[c].append(row[i] if i < len(row) else None)
+    finally:
+        workbook.close()
+    # 日付のセルは、アプリで使っている「7月1日」の形式の文字列にする
+    for c, dtype in schema.items():
+        if dtype == "str":
+            columns[c] = [
+                _date_label(v) if isinstance(v, datetime.date) else v
+                for v in columns[c]
+            ]
+    return pd.DataFrame(
+        {c: pd.Series(v, dtype=object) for c, v in columns.items()}, copy=False
+    )
+
+
+def _date_label(value):
+    return f"{value.month}月{value.day}日"
+
+
+def _check_columns(columns, schema):
+    missing = [c for c in schema if c not in columns]
+    if missing:
+        raise ValueError(f"必要な列がありません: {missing}")
+
+
+def _convert(df, schema):
+    # 数値の列は整数に変換できるかを列ごとにまとめて調べてから、指定の型にする
+    # 変換できなかった列は除いたデータフレームと、エラーのリストを返す
+    errors = []
+    columns = {}
+    for column, dtype in schema.items():
+        values = df[column]
+        if dtype == "str":
+            if values.isna().any():
+                errors.append(f"{column}: 空欄の行があります {_rows(values.isna())}")
+            columns[column] = values.astype(str)
+            continue
+        if pd.api.types.is_integer_dtype(values.dtype):
+            # 整数として読み込めた列は、値の範囲だけを調べる
+            numbers = values.to_numpy()
+        else:
+            numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+            invalid = np.isnan(numbers) | (numbers != np.round(numbers))
+            if invalid.any():
+                errors.append(f"{column}: 整数でない値があります {_rows(invalid)}")
+                continue
+        info = np.iinfo(dtype)
+        out_of_range = (numbers < info.min) | (numbers > info.max)
+        if out_of_range.any():
+            errors.append(f"{column}: 値が大きすぎます {_rows(out_of_range)}")
+            continue
+        columns[column] = numbers.astype(dtype)
+    return pd.DataFrame(columns, copy=False), errors
+
+
+def _validate_staff(df):
+    # 見つかった問題のリストを返す（型を変換できなかった列は調べない）
+    errors = []
+    if "スタッフID" in df:
+        duplicated = df["スタッフID"].duplicated(keep=False).to_numpy()
+        if duplicated.any():
+            errors.append(f"スタッフIDが重複しています {_rows(duplicated)}")
+    if "責任者フラグ" in df:
+        leader_flag = df["責任者フラグ"].to_numpy()
+        not_flag = (leader_flag != 0) & (leader_flag != 1)
+        if not_flag.any():
+            errors.append(f"責任者フラグは0か1にしてください {_rows(not_flag)}")
+    shift_columns = [c for c in ("希望最小出勤日数", "希望最大出勤日数") if c in df]
+    negative = np.zeros(len(df), dtype=bool)
+    for column in shift_columns:
+        negative |= df[column].to_numpy() < 0
+    if negative.any():
+        errors.append(f"希望出勤日数が負の値です {_rows(negative)}")
+    if len(shift_columns) == 2:
+        reversed_ = (
+            df["希望最小出勤日数"].to_numpy() > df["希望最大出勤日数"].to_numpy()
+        )
+        if reversed_.any():
+            errors.append(
+                f"希望最小出勤日数が希望最大出勤日数より大きい行があります {_rows(reversed_)}"
+            )
+    return errors
+
+
+def _validate_calendar(df):
+    errors = []
+    if "日付" in df:
+        duplicated = df["日付"].duplicated(keep=False).to_numpy()
+        if duplicated.any():
+            errors.append(f"日付が重複しています {_rows(duplicated)}")
+    negative = np.zeros(len(df), dtype=bool)
+    for column in ("出勤人数", "責任者人数"):
+        if column in df:
+            negative |= df[column].to_numpy() < 0
+    if negative.any():
+        errors.append(f"必要人数が負の値です {_rows(negative)}")
+    return errors
+
+
+def _rows(mask, limit=10):
+    # 問題のある行の番号（ヘッダーを除いて1から数える）を、多すぎる場合は先頭だけ示す
+    rows = np.flatnonzero(mask) + 1
+    text = ", ".join(str(r) for r in rows[:limit]) + "行目"
+    if len(rows) > limit:
+        text += f" ほか{len(rows) - limit}行"
+    return f"（{text}）"
@@ -0,0 +1,76 @@
+import io
+
+import numpy as np
+from openpyxl import Workbook
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def write_schedule_excel(path_or_buffer, sch_df, summary=None, kpis=None):
+    # シフト表と集計結果を、シートごとに1行ずつ書き出すExcelファイルにする
+    # write_onlyモードのワークブックは書き終えた行を保持しないので、大きなシフト表でもメモリが増えない
+    # summaryはScheduleSummary、kpisは「項目 -> 値」の辞書（目的関数値や計算時間など）
+    workbook = Workbook(write_only=True)
+
+    sheet = workbook.create_sheet("シフト表")
+    sheet.append([sch_df.index.name or "スタッフID"] + [str(d) for d in sch_df.columns])
+    values = np.asarray(sch_df)
+    for staff, row in zip(sch_df.index, values):
+        sheet.append([_to_cell(staff)] + row.tolist())
+
+    if summary is not None:
+        _append_frame(workbook.create_sheet("スタッフ別集計"), summary.staff)
+        _append_frame(workbook.create_sheet("日別集計"), summary.days)
+
+    if kpis:
+        sheet = workbook.create_sheet("KPI")
+        sheet.append(["項目", "値"])
+        for name, value in kpis.items():
+            sheet.append([name, _to_cell(value)])
+
+    workbook.save(path_or_buffer)
+
+
+def schedule_to_excel(sch_df, summary=None, kpis=None):
+    # ダウンロードボタンに渡せるように、Excelファイルの内容をバイト列で返す
+    buffer = io.BytesIO()
+    write_schedule_excel(buffer, sch_df, summary, kpis)
+    return buffer.getvalue()
+
+
+def result_kpis(result):
+    # get_resultやバックエンドのsolveが返す辞書から、KPIシートに書く項目を取り出す
+    kpis = {
+        "実行ステータス": result["status"],
+        "解の状態": result["solution_status"],
+        "目的関数値": result["objective"],
+        "求解時間（秒）": result["solve_time"],
+    }
+    summary = result.get("summary")
+    if summary is not None:
+        kpis["希望出勤日数からの不足・超過日数の合計"] = summary.total_deviation
+        kpis["必要人数を満たしていない日数"] = len(summary.uncovered_days)
+        # 希望の違反日数は、スラック変数の値ではなくシフト表から数えた値を使う
+        for name, value in (
+            ("休暇希望日の出勤日数", summary.ng_date_worked),
+            ("出勤希望日の欠勤日数", summary.preferred_date_missed),
+        ):
+            if value is not None:
+                kpis[name] = value
+    return kpis
+
+
+def _append_frame(sheet, df):
+    # インデックスを1列目にして、データフレームを1行ずつ書き出す
+    sheet.append([df.index.name or ""] + [str(c) for c in df.columns])
+    for index, row in zip(df.index, df.itertuples(index=False, name=None)):
+        sheet.append([_to_cell(index)] + [_to_cell(v) for v in row])
+
+
+def _to_cell(value):
+    # NumPyの数値はPythonの値に、リストなどのセルに書けない値は文字列にする
+    if hasattr(value, "item"):
+        return value.item()
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
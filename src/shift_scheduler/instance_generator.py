@@ -0,0 +1,174 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from .preferences import write_preferences
+
+
+def generate_instance(
+    n_staff,
+    n_days,
+    leader_ratio=0.3,
+    tightness=0.8,
+    ng_density=0.3,
+    start_date="2024-07-01",
+    seed=None,
+):
+    # data/staff.csv、data/calendar.csvと同じ形式の問題例と、スタッフごとの休暇希望日を作る
+    # leader_ratioは責任者の割合、tightnessは全スタッフの希望最大出勤日数の合計に対する
+    # 必要人数の合計の割合（1に近いほど厳しい）、ng_densityは休暇希望日があるスタッフの割合
+    rng = np.random.default_rng(seed)
+    staff_ids = [f"S{i + 1:0{len(str(n_staff))}d}" for i in range(n_staff)]
+
+    # 責任者は少なくとも1人はいるようにする
+    leader_flag = (rng.random(n_staff) < leader_ratio).astype(int)
+    leader_flag[rng.integers(n_staff)] = 1
+
+    # 希望出勤日数は期間の3割から5割を最小とし、最大はそこから期間の2割までの幅を持たせる
+    min_shift = np.maximum(1, np.round(n_days * rng.uniform(0.3, 0.5, n_staff)))
+    max_shift = np.minimum(
+        n_days, min_shift + rng.integers(0, max(1, n_days // 5) + 1, n_staff)
+    )
+    staff_df = pd.DataFrame(
+        {
+            "スタッフID": staff_ids,
+            "責任者フラグ": leader_flag,
+            "希望最小出勤日数": min_shift.astype(int),
+            "希望最大出勤日数": max_shift.astype(int),
+        }
+    )
+
+    # 必要人数の合計をtightnessで決めて、各日にランダムな比率で割り振る
+    total_required = tightness * max_shift.sum()
+    weights = rng.uniform(0.7, 1.3, n_days)
+    required_staff = np.clip(
+        np.round(total_required * weights / weights.sum()), 1, n_staff
+    ).astype(int)
+    required_leader = np.clip(
+        np.round(required_staff * leader_ratio * 0.5), 1, leader_flag.sum()
+    ).astype(int)
+    # 日付はサンプルデータと同じ「7月1日」の形式にし、1年を超えて重複する場合は年も付ける
+    dates = pd.date_range(start_date, periods=n_days)
+    labels = [f"{d.month}月{d.day}日" for d in dates]
+    if len(set(labels)) < n_days:
+        labels = [f"{d.year}年{d.month}月{d.day}日" for d in dates]
+    calendar_df = pd.DataFrame(
+        {
+            "日付": labels,
+            "出勤人数": required_staff,
+            "責任者人数": required_leader,
+        }
+    )
+
+    # 休暇希望日はng_densityの割合のスタッフにランダムな日付を1つずつ割り当てる
+    has_ng = rng.random(n_staff) < ng_density
+    ng_index = rng.integers(n_days, size=n_staff)
+    staff_ng_date = {
+        s: calendar_df["日付"][j] if ng else "すべてOK"
+        for s, ng, j in zip(staff_ids, has_ng, ng_index)
+    }
+    return staff_df, calendar_df, staff_ng_date
+
+
+def generate_preferences(staff_ids, dates, density=0.3, max_days=3, seed=None):
+    # densityの割合のスタッフに、1日からmax_days日までの重複しない希望日をランダムに割り当てる
+    # 休暇希望日・出勤希望日のどちらにも使える、スタッフ -> 日付のリストの辞書を返す
+    rng = np.random.default_rng(seed)
+    dates = list(dates)
+    max_days = max(1, min(max_days, len(dates)))
+    return {
+        s: [dates[j] for j in sorted(rng.choice(len(dates), n, replace=False))]
+        for s, n in zip(staff_ids, rng.integers(1, max_days + 1, len(staff_ids)))
+        if rng.random() < density
+    }
+
+
+def write_instance(
+    out_dir, staff_df, calendar_df, staff_ng_date, staff_preferred_date=None
+):
+    # staff.csv、calendar.csvと、休暇希望日をまとめたng_date.csvを書き出す
+    # 複数の希望日や出勤希望日は、スタッフID,日付,種類の形式のpreferences.csvに書き出す
+    os.makedirs(out_dir, exist_ok=True)
+    staff_df.to_csv(os.path.join(out_dir, "staff.csv"), index=False)
+    calendar_df.to_csv(os.path.join(out_dir, "calendar.csv"), index=False)
+    single_ng_date = all(isinstance(d, str) for d in staff_ng_date.values())
+    if single_ng_date:
+        pd.DataFrame(
+            {
+                "スタッフID": list(staff_ng_date),
+                "休暇希望日": list(staff_ng_date.values()),
+            }
+        ).to_csv(os.path.join(out_dir, "ng_date.csv"), index=False)
+    if staff_preferred_date or not single_ng_date:
+        write_preferences(
+            os.path.join(out_dir, "preferences.csv"),
+            staff_ng_date,
+            staff_preferred_date,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シフトスケジューリングの問題例を作る")
+    parser.add_argument("out_dir", help="CSVファイルを書き出すディレクトリ")
+    parser.add_argument("--staff", type=int, default=30, help="スタッフの人数")
+    parser.add_argument("--days", type=int, default=28, help="日数")
+    parser.add_argument("--leader-ratio", type=float, default=0.3, help="責任者の割合")
+    parser.add_argument(
+        "--tightness",
+        type=float,
+        default=0.8,
+        help="希望最大出勤日数の合計に対する必要人数の合計の割合",
+    )
+    parser.add_argument(
+        "--ng-density", type=float, default=0.3, help="休暇希望日があるスタッフの割合"
+    )
+    parser.add_argument(
+        "--ng-days",
+        type=int,
+        default=1,
+        help="1人あたりの休暇希望日の最大数（2以上ならpreferences.csvに書き出す）",
+    )
+    parser.add_argument(
+        "--preferred-density",
+        type=float,
+        default=0.0,
+        help="出勤希望日があるスタッフの割合（preferences.csvに書き出す）",
+    )
+    parser.add_argument(
+        "--preferred-days", type=int, default=3, help="1人あたりの出勤希望日の最大数"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード")
+    args = parser.parse_args()
+
+    staff_df, calendar_df, staff_ng_date = generate_instance(
+        args.staff,
+        args.days,
+        leader_ratio=args.leader_ratio,
+        tightness=args.tightness,
+        ng_density=args.ng_density,
+        seed=args.seed,
+    )
+    staff_ids = staff_df["スタッフID"]
+    dates = calendar_df["日付"]
+    # 希望日の乱数は問題例と別のシードにして、オプションを変えても問題例自体は変わらないようにする
+    seed = None if args.seed is None else args.seed + 1
+    if args.ng_days > 1:
+        staff_ng_date = generate_preferences(
+            staff_ids, dates, args.ng_density, args.ng_days, seed=seed
+        )
+    staff_preferred_date = generate_preferences(
+        staff_ids,
+        dates,
+        args.preferred_density,
+        args.preferred_days,
+        seed=None if seed is None else seed + 1,
+    )
+    write_instance(
+        args.out_dir, staff_df, calendar_df, staff_ng_date, staff_preferred_date
+    )
+
+
+if __name__ == "__main__":
+    main()
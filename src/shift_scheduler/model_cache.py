@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pulp
+
+from .solve_cache import SolveCache, user_cache_dir
+
+DEFAULT_MODEL_CACHE_DIR = user_cache_dir("model_cache")
+
+# MPSファイルの分け方や変数の対応表の形式を変えたら更新して、古いキャッシュを使わないようにする
+MODEL_CACHE_VERSION = 1
+
+# 目的関数の係数を書き換えるスラック変数の種類
+SLACK_VARIABLES = ("y_under", "y_over", "z_over", "z_under")
+
+
+def structure_key(shift_sch):
+    # モデルの構造（スタッフ、日付、責任者フラグ、希望のある組）から、キャッシュのキーを作る
+    # 目的関数の係数や制約の右辺は含まないので、それらだけが違う問題は同じキーになる
+    h = hashlib.sha256()
+    header = [
+        MODEL_CACHE_VERSION,
+        pulp.__version__,
+        [str(s) for s in shift_sch.S],
+        [str(d) for d in shift_sch.D],
+        [int(shift_sch.S2leader_flag[s]) for s in shift_sch.S],
+    ]
+    h.update(json.dumps(header, ensure_ascii=False).encode("utf-8"))
+    for rows, cols in (shift_sch.ng_index, shift_sch.preferred_index):
+        h.update(b"|")
+        h.update(np.asarray(rows, dtype=np.int64).tobytes())
+        h.update(np.asarray(cols, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+class ModelCache(SolveCache):
+    # コンパイル済みのモデルを、構造のキーごとにメモリとディスクに保存する
+    # ディスク上の合計サイズがmax_disk_bytesを超えたら、最後に使ったのが古いものから削除する
+    def __init__(
+        self,
+        cache_dir=DEFAULT_MODEL_CACHE_DIR,
+        max_memory_items=4,
+        max_disk_bytes=500 * 1024**2,
+    ):
+        super().__init__(cache_dir, max_memory_items, max_disk_bytes)
+
+
+class CompiledModel:
+    def __init__(self, head, columns, rhs, rhs_extra, tail, variables, rows, stats):
+        # PuLPが書き出したMPSファイルを、書き換える部分とそれ以外に分けて保持する
+        # head:      スラック変数より前の部分（0-1変数xの列をすべて含む）
+        # columns:   スラック変数以降の列ごとの (変数の番号, 目的関数以外の行のバイト列)
+        # rhs:       制約の番号順の右辺の値
+        # rhs_extra: 制約以外の行の右辺（目的関数の定数項など）のバイト列
+        # tail:      RHSの後の部分（変数の上下限など）
+        # variables: 変数の種類 -> ShiftSchedulerの配列と同じ形の変数の番号（モデルにない変数は-1）
+        # rows:      制約の種類 -> 日付またはスタッフの順の制約の番号
+        self.head = head
+        self.columns = columns
+        self.rhs = rhs
+        self.rhs_extra = rhs_extra
+        self.tail = tail
+        self.variables = variables
+        self.rows = rows
+        self.stats = stats
+
+    @classmethod
+    def compile(cls, shift_sch):
+        # 構築済みのShiftSchedulerのモデルを、変数と制約の名前を番号にした形式（X0000000、C0000000）で
+        # 書き出し、変数と制約の番号の対応表と一緒にまとめる
+        fd, path = tempfile.mkstemp(suffix=".mps")
+        os.close(fd)
+        try:
+            _, variable_names, constraint_names, _ = shift_sch.model.writeMPS(
+                path, rename=1
+            )
+            with open(path, "rb") as f:
+                data = f.read()
+        finally:
+            os.remove(path)
+
+        variables = {
+            kind: _name_index(variable_names, [v.name for v in array.ravel()]).reshape(
+                array.shape
+            )
+            for kind, array in (
+                ("x", shift_sch.x_array),
+                ("y_under", shift_sch.y_under_array),
+                ("y_over", shift_sch.y_over_array),
+                ("z_over", shift_sch.z_over_array),
+                ("z_under", shift_sch.z_under_array),
+            )
+        }
+        # 名前を付けずに追加した制約はnameがNoneなので、モデルの制約の辞書から同じオブジェクトのキーを探す
+        keys = {id(c): name for name, c in shift_sch.model.constraints.items()}
+        rows = {
+            kind: _name_index(
+                constraint_names, [keys.get(id(c)) for c in constraints.values()]
+            )
+            for kind, constraints in (
+                ("required_staff", shift_sch.c_required_staff),
+                ("required_leader", shift_sch.c_required_leader),
+                ("min_shift", shift_sch.c_min_shift),
+                ("max_shift", shift_sch.c_max_shift),
+            )
+        }
+        return cls._split(
+            data, variables, rows, len(variable_names), len(constraint_names)
+        )
+
+    @classmethod
+    def _split(cls, data, variables, rows, n_variables, n_rows):
+        lines = data.split(b"\n")
+        columns_start = lines.index(b"COLUMNS") + 1
+        rhs_start = lines.index(b"RHS") + 1
+        rhs_end = rhs_start
+        while rhs_end < len(lines) and lines[rhs_end].startswith(b" "):
+            rhs_end += 1
+
+        # スラック変数の最初の列より前は、そのまま使う
+        slack = set()
+        for kind in SLACK_VARIABLES:
+            slack.update(variables[kind][variables[kind] >= 0].tolist())
+        first = rhs_start - 1
+        for i in range(columns_start, rhs_start - 1):
+            fields = lines[i].split()
+            if fields[0] != b"MARK" and _index(fields[0]) in slack:
+                first = i
+                break
+
+        # それ以降は列ごとに分け、スラック変数の目的関数の係数の行だけを取り除く
+        columns = []
+        for line in lines[first : rhs_start - 1]:
+            fields = line.split()
+            column = -1 if fields[0] == b"MARK" else _index(fields[0])
+            if column < 0 or not columns or columns[-1][0] != column:
+                columns.append((column, []))
+            if not (fields[1] == b"OBJ" and column in slack):
+                columns[-1][1].append(line + b"\n")
+        columns = [(column, b"".join(group)) for column, group in columns]
+
+        rhs = np.zeros(n_rows)
+        rhs_extra = []
+        for line in lines[rhs_start:rhs_end]:
+            fields = line.split()
+            if fields[1].startswith(b"C"):
+                rhs[_index(fields[1])] = float(fields[2])
+            else:
+                rhs_extra.append(line + b"\n")
+
+        section = b"\n".join(lines[columns_start : rhs_start - 1])
+        stats = {
+            "variables": n_variables,
+            "binary_variables": int((variables["x"] >= 0).sum()),
+            "constraints": n_rows,
+            "nonzeros": section.count(b" C"),
+        }
+        return cls(
+            b"\n".join(lines[:first]) + b"\n",
+            columns,
+            rhs,
+            b"".join(rhs_extra),
+            b"\n".join(lines[rhs_end:]),
+            variables,
+            rows,
+            stats,
+        )
+
+    def write_mps(self, path, objective, rhs):
+        # 目的関数の係数と制約の右辺を書き換えたMPSファイルを書き出す
+        # objectiveはスラック変数の種類 -> スタッフの順の係数、rhsは制約の種類 -> 右辺の値
+        coefficients = {}
+        for kind, values in objective.items():
+            index = self.variables[kind]
+            values = np.asarray(values, dtype=float)
+            coefficients.update(zip(index[index >= 0].tolist(), values[index >= 0]))
+        rhs_values = self.rhs.copy()
+        for kind, values in rhs.items():
+            index = self.rows[kind]
+            rhs_values[index[index >= 0]] = np.asarray(values, dtype=float)[index >= 0]
+
+        with open(path, "wb") as f:
+            f.write(self.head)
+            for column, lines in self.columns:
+                f.write(lines)
+                if column in coefficients:
+                    f.write(
+                        b"    %-8s  OBJ       % .12e\n"
+                        % (_name(column), coefficients[column])
+                    )
+            f.write(b"RHS\n")
+            f.write(
+                b"".join(
+                    b"    RHS       C%07d  % .12e\n" % (i, value)
+                    for i, value in enumerate(rhs_values.tolist())
+                )
+            )
+            f.write(self.rhs_extra)
+            f.write(self.tail)
+
+    def write_initial_solution(self, path, values):
+        # CBCの-mipsで読み込む初期解のファイルを書き出す
+        # valuesは変数の種類 -> ShiftSchedulerの配列と同じ形の初期値
+        solution = np.zeros(self.stats["variables"])
+        for kind, value in values.items():
+            index = self.variables[kind]
+            solution[index[index >= 0]] = np.asarray(value, dtype=float)[index >= 0]
+        with open(path, "w") as f:
+            f.write("Stopped on time - objective value 0\n")
+            f.writelines(
+                f"{i:>7} {_name(i).decode()} {value:>15} {0:>23}\n"
+                for i, value in enumerate(solution.tolist())
+            )
+
+    def read_solution(self, path):
+        # CBCの解のファイルから、変数の種類 -> ShiftSchedulerの配列と同じ形の値を読み出す
+        solution = np.zeros(self.stats["variables"])
+        with open(path) as f:
+            f.readline()
+            for line in f:
+                fields = line.split()
+                if fields and fields[0] == "**":
+                    fields = fields[1:]
+                if len(fields) >= 3 and fields[1].startswith("X"):
+                    solution[int(fields[1][1:])] = float(fields[2])
+        return {
+            kind: np.where(index >= 0, solution[index.clip(0)], 0.0)
+            for kind, index in self.variables.items()
+        }
+
+
+def _name_index(names, keys):
+    # PuLPの元の名前 -> 番号付きの名前の辞書から、keysの順の番号の配列を作る
+    return np.fromiter(
+        (_index(names[k]) if k in names else -1 for k in keys),
+        dtype=np.int64,
+        count=len(keys),
+    )
+
+
+def _index(name):
+    # X0000012やC0000012のような名前から番号を取り出す
+    return int(name[1:])
+
+
+def _name(index):
+    return b"X%07d" % index
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# 休暇希望がないことを表す値（アプリの選択肢とサンプルデータで使っている）
+NO_PREFERENCE = "すべてOK"
+
+# 希望ファイルの「種類」の値
+NG_DATE = "休暇希望"
+PREFERRED_DATE = "出勤希望"
+
+
+def normalize_dates(value):
+    # スタッフ1人分の希望日を、重複のない日付のリストにする
+    # 日付1つ、日付のリストや集合、「すべてOK」や欠損値（希望なし）のいずれも受け付ける
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [] if value == NO_PREFERENCE else [value]
+    if np.ndim(value) == 0:
+        return [] if pd.isna(value) else [value]
+    return list(dict.fromkeys(d for d in value if d != NO_PREFERENCE))
+
+
+def normalize_preferences(staff_dates, staff_ids=None):
+    # スタッフ -> 希望日の辞書を、スタッフ -> 日付のリストの辞書にする（希望のないスタッフは空のリスト）
+    staff_dates = staff_dates or {}
+    if staff_ids is None:
+        staff_ids = list(staff_dates)
+    return {s: normalize_dates(staff_dates.get(s)) for s in staff_ids}
+
+
+def preference_index(staff_dates, staff_ids, dates):
+    # 希望日があるスタッフと日付の組を、staff_ids・datesでの位置の配列（行、列）で返す
+    # 希望の数だけの長さの配列なので、スタッフ×日付の全体を調べずに制約を作れる
+    # datesに含まれない日付は無視する
+    S2index = {s: i for i, s in enumerate(staff_ids)}
+    D2index = {d: j for j, d in enumerate(dates)}
+    pairs = [
+        (S2index[s], D2index[d])
+        for s, ds in staff_dates.items()
+        if s in S2index
+        for d in normalize_dates(ds)
+        if d in D2index
+    ]
+    rows = np.fromiter((i for i, _ in pairs), dtype=np.int64, count=len(pairs))
+    cols = np.fromiter((j for _, j in pairs), dtype=np.int64, count=len(pairs))
+    return rows, cols
+
+
+def read_preferences(path_or_buffer):
+    # 「スタッフID,日付,種類」の形式の疎な希望ファイルを読み込み、
+    # (休暇希望日の辞書, 出勤希望日の辞書) を返す。種類は「休暇希望」か「出勤希望」
+    df = pd.read_csv(path_or_buffer, dtype=str)
+    missing = {"スタッフID", "日付", "種類"} - set(df.columns)
+    if missing:
+        raise ValueError(f"希望ファイルに列がありません: {sorted(missing)}")
+    unknown = set(df["種類"]) - {NG_DATE, PREFERRED_DATE}
+    if unknown:
+        raise ValueError(f"希望ファイルの種類が不正です: {sorted(unknown)}")
+    return tuple(
+        df[df["種類"] == kind]
+        .groupby("スタッフID", sort=False)["日付"]
+        .agg(list)
+        .to_dict()
+        for kind in (NG_DATE, PREFERRED_DATE)
+    )
+
+
+def write_preferences(path_or_buffer, staff_ng_date, staff_preferred_date=None):
+    # read_preferencesで読み込める形式で、希望日を書き出す
+    rows = [
+        (s, d, kind)
+        for kind, staff_dates in (
+            (NG_DATE, staff_ng_date),
+            (PREFERRED_DATE, staff_preferred_date or {}),
+        )
+        for s, ds in staff_dates.items()
+        for d in normalize_dates(ds)
+    ]
+    pd.DataFrame(rows, columns=["スタッフID", "日付", "種類"]).to_csv(
+        path_or_buffer, index=False
+    )
@@ -0,0 +1,247 @@
+import datetime
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from .preferences import normalize_preferences
+from .solve_cache import data_hash, make_private_dir, to_builtin, user_cache_dir
+from .summary import ScheduleSummary
+
+# シフト表やスタッフのデータを含むので、本人だけが読み書きできるユーザーごとのディレクトリに置く
+DEFAULT_DB_PATH = os.path.join(user_cache_dir("run_store"), "runs.sqlite3")
+
+# 保存しておく実行結果の数（超えたら古いものから削除する）
+MAX_RUNS = 1000
+
+# 一覧に表示する列
+LIST_COLUMNS = [
+    "id",
+    "created_at",
+    "backend",
+    "status",
+    "objective",
+    "solve_time",
+    "n_staff",
+    "n_days",
+    "total_deviation",
+]
+
+
+class RunStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_runs=MAX_RUNS):
+        # 最適化の実行結果（入力データのハッシュ値、パラメータ、状態、目的関数値、時間、シフト表）を
+        # SQLiteのファイルに保存する。シフト表は0/1をビットに詰めて圧縮するので、1万人×1年でも数百KB
+        self.db_path = db_path
+        self.max_runs = max_runs
+        # 他のユーザーが結果を読んだり、最適解として表示される行を書き込んだりできないように、
+        # ディレクトリの所有者と権限を確かめる
+        directory = os.path.dirname(db_path)
+        if directory:
+            make_private_dir(directory)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    data_hash TEXT NOT NULL,
+                    params_hash TEXT,
+                    backend TEXT,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    solution_status TEXT NOT NULL,
+                    optimal INTEGER NOT NULL,
+                    objective REAL,
+                    solve_time REAL,
+                    time_to_first_feasible REAL,
+                    n_staff INTEGER NOT NULL,
+                    n_days INTEGER NOT NULL,
+                    total_deviation INTEGER,
+                    staff_ids TEXT NOT NULL,
+                    dates TEXT NOT NULL,
+                    schedule BLOB,
+                    summary_inputs TEXT NOT NULL,
+                    details TEXT NOT NULL
+                )
+                """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_data_hash ON runs (data_hash)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_params_hash ON runs (params_hash)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def save(
+        self,
+        result,
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        staff_preferred_date=None,
+        preferred_penalty=None,
+        backend=None,
+        solver_options=None,
+        params_hash=None,
+    ):
+        # get_resultやバックエンドのsolveが返す結果を保存し、実行結果のIDを返す
+        # params_hashはsolve_cache.make_keyの値（同じ条件の実行を探すのに使う）
+        staff_ids = staff_df["スタッフID"].tolist()
+        dates = calendar_df["日付"].tolist()
+        params = {
+            "staff_penalty": staff_penalty,
+            "staff_ng_date": normalize_preferences(staff_ng_date),
+            "off_penalty": off_penalty,
+            "staff_preferred_date": normalize_preferences(staff_preferred_date),
+            "preferred_penalty": preferred_penalty,
+            "solver_options": solver_options or {},
+        }
+        # 保存した結果から集計（ScheduleSummary）を作り直すのに使う値
+        summary_inputs = {
+            "leader_flag": staff_df["責任者フラグ"].tolist(),
+            "required_staff": calendar_df["出勤人数"].tolist(),
+            "required_leader": calendar_df["責任者人数"].tolist(),
+            "min_shift": staff_df["希望最小出勤日数"].tolist(),
+            "max_shift": staff_df["希望最大出勤日数"].tolist(),
+        }
+        details = {
+            "slack": {
+                k: np.asarray(v).tolist() for k, v in (result["slack"] or {}).items()
+            },
+            "phase_stats": result.get("phase_stats") or {},
+            "model_stats": result.get("model_stats") or {},
+        }
+        schedule = None
+        if result["sch_df"] is not None:
+            schedule = zlib.compress(
+                np.packbits(result["sch_df"].to_numpy().astype(bool)).tobytes()
+            )
+        summary = result.get("summary")
+        row = (
+            time.time(),
+            data_hash(staff_df, calendar_df),
+            params_hash,
+            backend,
+            _dumps(params),
+            result["status"],
+            result["solution_status"],
+            int(bool(result["optimal"])),
+            result["objective"],
+            result["solve_time"],
+            result["time_to_first_feasible"],
+            len(staff_ids),
+            len(dates),
+            None if summary is None else summary.total_deviation,
+            _dumps(staff_ids),
+            _dumps(dates),
+            schedule,
+            _dumps(summary_inputs),
+            _dumps(details),
+        )
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (created_at, data_hash, params_hash, backend, "
+                "params, status, solution_status, optimal, objective, solve_time, "
+                "time_to_first_feasible, n_staff, n_days, total_deviation, "
+                "staff_ids, dates, schedule, summary_inputs, details) "
+                f"VALUES ({', '.join('?' * len(row))})",
+                row,
+            )
+            conn.execute(
+                "DELETE FROM runs WHERE id <= ?", (cursor.lastrowid - self.max_runs,)
+            )
+        return cursor.lastrowid
+
+    def list_runs(self, limit=20, data_hash=None):
+        # 新しい順に実行結果の一覧を返す（シフト表は読み込まない）
+        # data_hashを渡すと、同じ入力データの実行結果だけにする
+        query = f"SELECT {', '.join(LIST_COLUMNS)} FROM runs"
+        args = []
+        if data_hash is not None:
+            query += " WHERE data_hash = ?"
+            args.append(data_hash)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(query, conn, params=args)
+        # 実行日時は、このコンピューターのタイムゾーンの日時にする
+        df["created_at"] = pd.to_datetime(
+            df["created_at"].map(datetime.datetime.fromtimestamp)
+        )
+        return df
+
+    def find(self, params_hash):
+        # 同じ入力データとパラメータで最適解が得られた、最も新しい実行結果のIDを返す
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id FROM runs WHERE params_hash = ? AND optimal = 1 "
+                "ORDER BY created_at DESC LIMIT 1",
+                (params_hash,),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def load(self, run_id):
+        # 保存した実行結果を、get_resultと同じ形式の辞書で返す（なければNone）
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        staff_ids = json.loads(row["staff_ids"])
+        dates = json.loads(row["dates"])
+        details = json.loads(row["details"])
+        params = json.loads(row["params"])
+        sch_df = None
+        summary = None
+        if row["schedule"] is not None:
+            bits = np.frombuffer(zlib.decompress(row["schedule"]), dtype=np.uint8)
+            schedule = np.unpackbits(bits, count=len(staff_ids) * len(dates)).reshape(
+                len(staff_ids), len(dates)
+            )
+            sch_df = pd.DataFrame(schedule, index=staff_ids, columns=dates, copy=False)
+            summary_inputs = json.loads(row["summary_inputs"])
+            summary = ScheduleSummary(
+                schedule,
+                staff_ids,
+                dates,
+                summary_inputs["leader_flag"],
+                summary_inputs["required_staff"],
+                summary_inputs["required_leader"],
+                summary_inputs["min_shift"],
+                summary_inputs["max_shift"],
+                params["staff_ng_date"],
+                params["staff_preferred_date"],
+            )
+        return {
+            "status": row["status"],
+            "solution_status": row["solution_status"],
+            "optimal": bool(row["optimal"]),
+            "objective": row["objective"],
+            "sch_df": sch_df,
+            "slack": {k: np.asarray(v) for k, v in details["slack"].items()},
+            "summary": summary,
+            "solve_time": row["solve_time"],
+            "time_to_first_feasible": row["time_to_first_feasible"],
+            "phase_stats": details["phase_stats"],
+            "model_stats": details["model_stats"],
+            "profile_report": None,
+            "run_id": row["id"],
+            "params": params,
+        }
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=to_builtin)
@@ -0,0 +1,176 @@
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .ShiftScheduler_8_2 import ShiftScheduler
+
+# ワーカープロセスごとの入力データと、直前に使ったShiftScheduler（モデルの再利用に使う）
+_worker_data = None
+_worker_scheduler = None
+
+
+def grid_scenarios(staff_ids, staff_penalty_values, off_penalty_values):
+    # 全スタッフ共通の希望違反ペナルティと希望休暇ペナルティのすべての組み合わせを作る
+    return [
+        {
+            "staff_penalty": {s: staff_penalty for s in staff_ids},
+            "off_penalty": off_penalty,
+        }
+        for staff_penalty, off_penalty in itertools.product(
+            staff_penalty_values, off_penalty_values
+        )
+    ]
+
+
+def random_scenarios(
+    staff_ids, n, penalty_range=(0, 100), off_penalty_range=(0, 100), seed=None
+):
+    # スタッフごとの希望違反ペナルティと希望休暇ペナルティを、範囲内の整数からランダムにn通り選ぶ
+    rng = random.Random(seed)
+    return [
+        {
+            "staff_penalty": {s: rng.randint(*penalty_range) for s in staff_ids},
+            "off_penalty": rng.randint(*off_penalty_range),
+        }
+        for _ in range(n)
+    ]
+
+
+def run_scenarios(
+    staff_df,
+    calendar_df,
+    staff_ng_date,
+    scenarios,
+    max_workers=None,
+    solver_options=None,
+    staff_preferred_date=None,
+    preferred_penalty=None,
+):
+    # ペナルティの設定ごとにシフト表を作り、すべてのCPUコアで並列に最適化する
+    # 結果はscenariosと同じ順番のリストで、各要素は_solve_scenarioが返す辞書
+    # solver_optionsはShiftScheduler.solveに渡すスレッド数や制限時間などの設定
+    # preferred_penaltyは全設定で共通の出勤希望のペナルティ（省略時は各設定の希望休暇ペナルティと同じ）
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(scenarios)))
+    results = [None] * len(scenarios)
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            staff_df,
+            calendar_df,
+            dict(staff_ng_date),
+            dict(staff_preferred_date or {}),
+            preferred_penalty,
+        ),
+    ) as executor:
+        futures = {
+            executor.submit(_solve_scenario, scenario, solver_options or {}): i
+            for i, scenario in enumerate(scenarios)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = dict(future.result(), scenario=i)
+    return results
+
+
+def pareto_front(results):
+    # 希望出勤日数からの乖離日数と休暇希望の違反数の両方で、他の結果に劣らない結果を返す
+    # 同じ値の組が複数あれば最初の1つだけを残す
+    solved = [r for r in results if r["sch_df"] is not None]
+    points = np.array(
+        [[r["deviation"], r["ng_violation"]] for r in solved], dtype=float
+    ).reshape(-1, 2)
+    front = []
+    seen = set()
+    for i, r in enumerate(solved):
+        dominated = np.any(
+            np.all(points <= points[i], axis=1) & np.any(points < points[i], axis=1)
+        )
+        key = tuple(points[i])
+        if not dominated and key not in seen:
+            seen.add(key)
+            front.append(r)
+    return sorted(front, key=lambda r: (r["deviation"], r["ng_violation"]))
+
+
+def _init_worker(
+    staff_df, calendar_df, staff_ng_date, staff_preferred_date, preferred_penalty
+):
+    global _worker_data, _worker_scheduler
+    _worker_data = (
+        staff_df,
+        calendar_df,
+        staff_ng_date,
+        staff_preferred_date,
+        preferred_penalty,
+    )
+    _worker_scheduler = None
+
+
+def _solve_scenario(scenario, solver_options):
+    # 1つのペナルティの設定を解き、シフト表と評価指標、各段階の時間を返す
+    global _worker_scheduler
+    (
+        staff_df,
+        calendar_df,
+        staff_ng_date,
+        staff_preferred_date,
+        preferred_penalty,
+    ) = _worker_data
+    staff_penalty = scenario["staff_penalty"]
+    off_penalty = scenario["off_penalty"]
+    data = (
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        staff_preferred_date,
+        preferred_penalty,
+    )
+
+    # profileはShiftScheduler.solveの引数ではないので、取り出して計測の設定に使う
+    solver_options = dict(solver_options)
+    profile = solver_options.pop("profile", False)
+
+    # 同じワーカーで2回目以降は、構築済みのモデルの係数だけを書き換える
+    start = time.perf_counter()
+    if _worker_scheduler is not None:
+        _worker_scheduler.enable_profiling(cpu=profile, memory=profile)
+        _worker_scheduler.reset_profile()
+    if _worker_scheduler is None or not _worker_scheduler.update_data(*data):
+        _worker_scheduler = ShiftScheduler()
+        _worker_scheduler.enable_profiling(cpu=profile, memory=profile)
+        _worker_scheduler.set_data(*data)
+        _worker_scheduler.build_model()
+    build_time = time.perf_counter() - start
+
+    shift_sch = _worker_scheduler
+    shift_sch.solve(**solver_options)
+    solve_result = shift_sch.get_result()
+    result = {
+        "staff_penalty": staff_penalty,
+        "off_penalty": off_penalty,
+        "status": solve_result["status"],
+        "objective": solve_result["objective"],
+        "sch_df": shift_sch.sch_df,
+        "deviation": None,
+        "ng_violation": None,
+        "build_time": build_time,
+        "solve_time": shift_sch.solve_time,
+        "total_time": time.perf_counter() - start,
+    }
+    if shift_sch.sch_df is not None:
+        # 希望出勤日数からの不足・超過日数の合計と、休暇希望日に出勤した日数の合計
+        # スラック変数はペナルティが0だと値が決まらないので、どちらもシフト表の集計から数える
+        result["deviation"] = solve_result["summary"].total_deviation
+        result["ng_violation"] = solve_result["summary"].ng_date_worked
+    return result
@@ -0,0 +1,208 @@
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .preferences import normalize_preferences
+
+
+def user_cache_dir(name):
+    # ユーザーごとのキャッシュのディレクトリ（$XDG_CACHE_HOMEか~/.cacheの下）
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "shift_scheduler", name)
+
+
+def make_private_dir(path):
+    # キャッシュのpickleは読み込むとコードを実行でき、実行結果のデータベースにはスタッフの
+    # データが含まれるので、他のユーザーが読み書きできない自分だけのディレクトリにする
+    # そうなっていなければ、読み込まずにエラーにする
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        stat = os.stat(path)
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+            raise PermissionError(
+                f"保存先のディレクトリが他のユーザーから読み書きできます: {path}"
+            )
+
+
+DEFAULT_CACHE_DIR = user_cache_dir("solve_cache")
+
+# キャッシュする結果の形式を変えたら更新して、古い形式の結果を使わないようにする
+CACHE_VERSION = 6
+
+
+def make_key(
+    staff_df,
+    calendar_df,
+    staff_penalty,
+    staff_ng_date,
+    off_penalty,
+    staff_preferred_date=None,
+    preferred_penalty=None,
+):
+    # スタッフ・カレンダーのデータフレームとパラメータから、実行ごとに変わらないハッシュ値を作る
+    h = hashlib.sha256()
+    h.update(str(CACHE_VERSION).encode("utf-8"))
+    _update_frames(h, staff_df, calendar_df)
+    params = [
+        sorted((str(s), to_builtin(v)) for s, v in staff_penalty.items()),
+        _preference_key(staff_ng_date),
+        to_builtin(off_penalty),
+        _preference_key(staff_preferred_date),
+        to_builtin(preferred_penalty),
+    ]
+    h.update(json.dumps(params, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+def data_hash(staff_df, calendar_df):
+    # スタッフ・カレンダーのデータフレームの内容のハッシュ値（パラメータは含まない）
+    h = hashlib.sha256()
+    _update_frames(h, staff_df, calendar_df)
+    return h.hexdigest()
+
+
+def _update_frames(h, *frames):
+    # データフレームの列名と内容をハッシュに加える（make_keyとdata_hashで同じ値にする）
+    for df in frames:
+        h.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+
+
+def _preference_key(staff_dates):
+    # 日付の順番や「すべてOK」の書き方が違っても、同じ希望なら同じ値にする
+    return sorted(
+        (str(s), sorted(str(d) for d in ds))
+        for s, ds in normalize_preferences(staff_dates).items()
+        if ds
+    )
+
+
+def to_builtin(value):
+    # NumPyの数値や配列、集合などをJSONにできるPythonの値に変換する
+    # （json.dumpsのdefaultにも使う）
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, set):
+        return list(value)
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return str(value)
+
+
+class SolveCache:
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        max_memory_items=32,
+        max_disk_bytes=100 * 1024**2,
+    ):
+        # ディスクキャッシュのディレクトリ（Noneならメモリのみ）
+        self.cache_dir = cache_dir
+        # メモリに保持する結果の最大数
+        self.max_memory_items = max_memory_items
+        # ディスクキャッシュの最大サイズ（バイト）
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()  # キー -> 結果（末尾ほど最近使われたもの）
+        self._lock = threading.Lock()
+
+        if self.cache_dir is not None:
+            make_private_dir(self.cache_dir)
+
+    def get(self, key):
+        # キャッシュから結果を取り出す。見つからなければNoneを返す
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+            path = self._path(key)
+            if path is None or not os.path.exists(path):
+                return None
+            try:
+                with open(path, "rb") as f:
+                    result = pickle.load(f)
+                # 最終アクセス時刻を更新して、ディスク上でも最近使われたものとして扱う
+                os.utime(path)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # 別のプロセスが削除した場合や、書きかけのファイルは見つからなかったものとする
+                return None
+            self._put_memory(key, result)
+            return result
+
+    def put(self, key, result):
+        # 結果をメモリとディスクに保存し、上限を超えたら古いものから削除する
+        with self._lock:
+            self._put_memory(key, result)
+
+            path = self._path(key)
+            if path is None:
+                return
+            # 複数のプロセスが同じディレクトリに書き込んでも衝突しないように、一意な名前の一時ファイルに
+            # 書いてから置き換える。ディスクへの保存に失敗しても、メモリのキャッシュは使えるので続ける
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except OSError:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+                return
+            self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for path, _, _ in self._disk_entries():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+
+    def _put_memory(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def _disk_entries(self):
+        # ディスク上のキャッシュファイルを (パス, 最終アクセス時刻, サイズ) で返す
+        if self.cache_dir is None:
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # 一覧を取ってから別のプロセスが削除したファイル
+                    continue
+                entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_disk_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
@@ -0,0 +1,209 @@
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+
+from .backends import get_backend
+
+
+def _worker_main(conn):
+    # ワーカープロセスを新しいプロセスグループにして、中断時にCBCの子プロセスごと終了できるようにする
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+    # バックエンドごとに直前のモデルを保持して、同じ構造の問題ならモデルを再利用する
+    backends = {}
+    while True:
+        try:
+            params = conn.recv()
+        except EOFError:
+            break
+        backend_name = params.pop("backend")
+        try:
+            if backend_name not in backends:
+                backends[backend_name] = get_backend(backend_name)
+            solver_options = params.pop("solver_options") or {}
+            result = backends[backend_name].solve(**params, **solver_options)
+            conn.send(("done", result))
+        except Exception as e:
+            backends.pop(backend_name, None)
+            conn.send(("failed", f"{type(e).__name__}: {e}"))
+
+
+class _WorkerProcess:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def run(self, params):
+        # 問題をワーカーに送り、結果が返るまで待つ（ワーカーが終了されるとEOFErrorになる）
+        self.conn.send(params)
+        return self.conn.recv()
+
+    def kill(self):
+        # プロセスグループごと終了して、実行中のCBCも止める
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            # プロセスグループがまだ作られていない場合は、ワーカーだけを終了する
+            self.process.kill()
+        self.process.join()
+
+
+class SolveJob:
+    def __init__(self, params):
+        self.params = params  # バックエンドに渡す入力データとパラメータ
+        self.status = "queued"  # queued, running, done, failed, cancelled
+        self.result = None  # バックエンドが返す最適化結果
+        self.error = None  # 失敗したときのエラーメッセージ
+
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._worker = None
+
+    @property
+    def elapsed(self):
+        # 実行中なら開始からの経過時間、終了していれば実行時間（秒）
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+    def done(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def cancel(self):
+        # 待機中なら実行せずに取り消し、実行中ならワーカーとCBCを終了する
+        with self._lock:
+            if self.done():
+                return False
+            if self.status == "queued":
+                self._finish("cancelled")
+                return True
+            self.status = "cancelled"
+            worker = self._worker
+        if worker is not None:
+            worker.kill()
+        return True
+
+    def _start(self, worker):
+        with self._lock:
+            if self.status != "queued":
+                return False
+            self.status = "running"
+            self.started_at = time.time()
+            self._worker = worker
+            return True
+
+    def _finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self._worker = None
+        self._finished.set()
+
+
+class SolveJobPool:
+    def __init__(self, max_workers=2):
+        # 同時に実行する最適化の数（ワーカープロセスの数）
+        self.max_workers = max_workers
+
+        self._context = mp.get_context("spawn")
+        self._queue = queue.Queue()
+        self._workers = {}
+        self._threads = [
+            threading.Thread(target=self._dispatch, args=(i,), daemon=True)
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self,
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        initial_schedule=None,
+        solver_options=None,
+        backend="pulp_cbc",
+        staff_preferred_date=None,
+        preferred_penalty=None,
+    ):
+        # 最適化をキューに入れ、進み具合の確認や中断に使うSolveJobを返す
+        # backendはbackends.BACKENDSの名前、solver_optionsはスレッド数や制限時間などの設定
+        job = SolveJob(
+            dict(
+                staff_df=staff_df,
+                calendar_df=calendar_df,
+                staff_penalty=dict(staff_penalty),
+                staff_ng_date=dict(staff_ng_date),
+                off_penalty=off_penalty,
+                staff_preferred_date=dict(staff_preferred_date or {}),
+                preferred_penalty=preferred_penalty,
+                initial_schedule=initial_schedule,
+                solver_options=solver_options,
+                backend=backend,
+            )
+        )
+        self._queue.put(job)
+        return job
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for worker in list(self._workers.values()):
+            worker.kill()
+
+    def _dispatch(self, i):
+        # ワーカープロセス1つにつき1つのスレッドが、キューからジョブを取り出して実行する
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            worker = self._workers.get(i)
+            if worker is None or not worker.is_alive():
+                worker = self._workers[i] = _WorkerProcess(self._context)
+            if not job._start(worker):
+                continue
+
+            try:
+                status, value = worker.run(job.params)
+            except (EOFError, OSError):
+                # 中断などでワーカーが終了した場合は、次のジョブで新しいワーカーを起動する
+                worker.conn.close()
+                self._workers.pop(i, None)
+                if job.status == "cancelled":
+                    job._finish("cancelled")
+                else:
+                    job._finish("failed", error="solver worker terminated")
+                continue
+
+            if job.status == "cancelled":
+                job._finish("cancelled")
+            elif status == "done":
+                job._finish("done", result=value)
+            else:
+                job._finish("failed", error=value)
@@ -0,0 +1,491 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from .solve_cache import make_private_dir, to_builtin, user_cache_dir
+from .solve_job import SolveJobPool
+from .summary import ScheduleSummary
+
+# ジョブのパラメータにはスタッフのデータが含まれるので、本人だけが読み書きできるディレクトリに置く
+DEFAULT_DB_PATH = os.path.join(user_cache_dir("solve_service"), "queue.sqlite3")
+DEFAULT_PORT = 8500
+
+# 実行中のジョブの最終確認時刻がこれより古ければ、そのソルバーのプロセスは止まったとみなし、
+# ジョブを待機中に戻して別のプロセスで解き直す（秒）
+LEASE_SECONDS = 30
+
+# ジョブの状態。cancelledは待機中・実行中のどちらからでも移る
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+# ジョブのパラメータのうち、データフレームとして送るもの
+FRAME_PARAMS = ("staff_df", "calendar_df", "initial_schedule")
+
+
+class JobQueue:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        # ジョブをSQLiteのファイルに保存するキュー。複数のソルバーのプロセスが同じファイルを共有でき、
+        # プロセスを再起動しても待機中のジョブは失われない
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            make_private_dir(directory)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    submitted_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+                """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def submit(self, params):
+        # JSONにしたパラメータをキューに入れ、ジョブのIDを返す
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, submitted_at) "
+                "VALUES (?, 'queued', ?, ?)",
+                (job_id, params, time.time()),
+            )
+        return job_id
+
+    def claim(self):
+        # 最も古い待機中のジョブを実行中にして (ID, パラメータ) を返す。なければNone
+        # 最終確認時刻が古い実行中のジョブは、先に待機中に戻す
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', started_at = NULL "
+                    "WHERE status = 'running' AND heartbeat_at < ?",
+                    (now - LEASE_SECONDS,),
+                )
+                row = conn.execute(
+                    "SELECT id, params FROM jobs WHERE status = 'queued' "
+                    "ORDER BY submitted_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, "
+                        "heartbeat_at = ? WHERE id = ?",
+                        (now, now, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def heartbeat(self, job_ids):
+        # 実行中のジョブの最終確認時刻を更新し、その間に取り消されたジョブのIDを返す
+        if not job_ids:
+            return []
+        job_ids = list(job_ids)
+        placeholders = ", ".join("?" * len(job_ids))
+        with closing(self._connect()) as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? "
+                f"WHERE status = 'running' AND id IN ({placeholders})",
+                [time.time(), *job_ids],
+            )
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE status = 'cancelled' "
+                f"AND id IN ({placeholders})",
+                job_ids,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def finish(self, job_id, status, result=None, error=None):
+        # 実行中のジョブを終了にする（取り消されたジョブはそのままにする）
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def cancel(self, job_id):
+        # 待機中または実行中のジョブを取り消す。実行中のソルバーはディスパッチャーが止める
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                "SELECT id, status, result, error, submitted_at, started_at, "
+                "finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return None if row is None else dict(row)
+
+    def counts(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+class SolveService:
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_workers=2, poll_interval=0.2):
+        # キューから取り出したジョブをSolveJobPoolのワーカープロセスで解き、結果をキューに書き戻す
+        self.queue = JobQueue(db_path)
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.pool = SolveJobPool(max_workers=max_workers)
+        self._running = {}  # ジョブのID -> SolveJob
+        self._stop = threading.Event()
+
+    def dispatch_forever(self):
+        while not self._stop.is_set():
+            self.dispatch_once()
+            self._stop.wait(self.poll_interval)
+
+    def dispatch_once(self):
+        for job_id, job in list(self._running.items()):
+            if job.done():
+                del self._running[job_id]
+                result = encode_result(job.result) if job.status == "done" else None
+                self.queue.finish(job_id, job.status, result, job.error)
+        for job_id in self.queue.heartbeat(self._running):
+            self._running.pop(job_id).cancel()
+        while len(self._running) < self.max_workers:
+            claimed = self.queue.claim()
+            if claimed is None:
+                break
+            job_id, params = claimed
+            try:
+                self._running[job_id] = self.pool.submit(**decode_params(params))
+            except (KeyError, TypeError, ValueError) as e:
+                self.queue.finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+
+    def shutdown(self):
+        self._stop.set()
+        self.pool.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # POST /jobs: ジョブを登録する、GET /jobs/<id>: 状態と結果、DELETE /jobs/<id>: 取り消し、
+    # GET /health: 状態ごとのジョブの数
+    def do_POST(self):
+        if self.path != "/jobs":
+            return self._send(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        try:
+            decode_params(body)
+        except (KeyError, TypeError, ValueError) as e:
+            return self._send(400, {"error": f"{type(e).__name__}: {e}"})
+        job_id = self.server.queue.submit(body)
+        self._send(202, {"id": job_id, "status": "queued"})
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send(200, self.server.queue.counts())
+        job = self._job()
+        if job is not None:
+            self._send(200, job)
+
+    def do_DELETE(self):
+        job = self._job()
+        if job is not None:
+            self._send(200, {"cancelled": self.server.queue.cancel(job["id"])})
+
+    def _job(self):
+        job = None
+        if self.path.startswith("/jobs/"):
+            job = self.server.queue.get(self.path[len("/jobs/") :])
+        if job is None:
+            self._send(404, {"error": "not found"})
+        return job
+
+    def _send(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # アプリは0.5秒ごとに状態を問い合わせるので、アクセスログは出さない
+        pass
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, db_path=DEFAULT_DB_PATH, max_workers=2):
+    # HTTPのAPIとディスパッチャーを起動する。ソルバーを増やすときは、同じdb_pathを使う
+    # dispatchのプロセス（HTTPなし）を追加で起動する
+    service = SolveService(db_path, max_workers)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.queue = service.queue
+    dispatcher = threading.Thread(target=service.dispatch_forever, daemon=True)
+    dispatcher.start()
+    print(f"solve service: http://{host}:{port} (queue: {db_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def dispatch(db_path=DEFAULT_DB_PATH, max_workers=2):
+    # HTTPのポートを開かずに、キューのジョブを解くだけのプロセスを起動する
+    # キューはSQLiteのファイルなので、APIのプロセスと同じホストで同じdb_pathを使う
+    service = SolveService(db_path, max_workers)
+    print(f"solve dispatcher (queue: {db_path})")
+    try:
+        service.dispatch_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+
+
+class RemoteSolveJob:
+    def __init__(
+        self,
+        client,
+        job_id,
+        staff_df,
+        calendar_df,
+        staff_ng_date=None,
+        staff_preferred_date=None,
+    ):
+        # SolveJobと同じ使い方で、ソルバーのサービスで実行中のジョブの状態を問い合わせる
+        self.client = client
+        self.job_id = job_id
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        # 結果の集計（ScheduleSummary）は、送った入力データからアプリ側で作る
+        self._staff_df = staff_df
+        self._calendar_df = calendar_df
+        self._staff_ng_date = staff_ng_date
+        self._staff_preferred_date = staff_preferred_date
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+    def done(self):
+        # 終了していなければサービスに状態を問い合わせる
+        if self.status in FINISHED_STATUSES:
+            return True
+        try:
+            job = self.client.request("GET", f"/jobs/{self.job_id}")
+        except (OSError, ValueError) as e:
+            self.status = "failed"
+            self.error = f"solve service unavailable: {e}"
+            return True
+        self.started_at = job["started_at"]
+        self.finished_at = job["finished_at"]
+        if job["status"] == "done":
+            self.result = decode_result(
+                job["result"],
+                self._staff_df,
+                self._calendar_df,
+                self._staff_ng_date,
+                self._staff_preferred_date,
+            )
+        self.error = job["error"]
+        self.status = job["status"]
+        return self.status in FINISHED_STATUSES
+
+    def cancel(self):
+        try:
+            return self.client.request("DELETE", f"/jobs/{self.job_id}")["cancelled"]
+        except (OSError, ValueError):
+            return False
+
+
+class RemoteSolveJobPool:
+    def __init__(self, url, timeout=10):
+        # SolveJobPoolと同じsubmitで、最適化をソルバーのサービスに送る
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, body=None):
+        request = urllib.request.Request(
+            self.url + path,
+            data=None if body is None else body.encode("utf-8"),
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            raise ValueError(f"{e.code}: {e.read().decode('utf-8', 'replace')}")
+
+    def submit(
+        self,
+        staff_df,
+        calendar_df,
+        staff_penalty,
+        staff_ng_date,
+        off_penalty,
+        initial_schedule=None,
+        solver_options=None,
+        backend="pulp_cbc",
+        staff_preferred_date=None,
+        preferred_penalty=None,
+    ):
+        params = dict(
+            staff_df=staff_df,
+            calendar_df=calendar_df,
+            staff_penalty=dict(staff_penalty),
+            staff_ng_date=dict(staff_ng_date),
+            off_penalty=off_penalty,
+            staff_preferred_date=dict(staff_preferred_date or {}),
+            preferred_penalty=preferred_penalty,
+            initial_schedule=initial_schedule,
+            solver_options=solver_options,
+            backend=backend,
+        )
+        job = self.request("POST", "/jobs", encode_params(params))
+        return RemoteSolveJob(
+            self,
+            job["id"],
+            staff_df,
+            calendar_df,
+            params["staff_ng_date"],
+            params["staff_preferred_date"],
+        )
+
+
+def encode_params(params):
+    # ジョブのパラメータをJSONにする（データフレームは列名、インデックス、値のリストにする）
+    params = dict(params)
+    for key in FRAME_PARAMS:
+        if params.get(key) is not None:
+            params[key] = _encode_frame(params[key])
+    return json.dumps(params, ensure_ascii=False, default=to_builtin)
+
+
+def decode_params(text):
+    params = json.loads(text)
+    for key in FRAME_PARAMS:
+        if params.get(key) is not None:
+            params[key] = _decode_frame(params[key])
+    for key in ("staff_df", "calendar_df", "staff_penalty", "staff_ng_date"):
+        if params.get(key) is None:
+            raise ValueError(f"missing parameter: {key}")
+    return params
+
+
+def encode_result(result):
+    # 最適化結果をJSONにする。集計（ScheduleSummary）は送らず、受け取った側で作り直す
+    result = dict(result)
+    result.pop("summary", None)
+    if result["sch_df"] is not None:
+        result["sch_df"] = _encode_frame(result["sch_df"])
+    result["slack"] = {
+        k: np.asarray(v).tolist() for k, v in (result["slack"] or {}).items()
+    }
+    return json.dumps(result, ensure_ascii=False, default=to_builtin)
+
+
+def decode_result(
+    text, staff_df, calendar_df, staff_ng_date=None, staff_preferred_date=None
+):
+    result = json.loads(text)
+    result["slack"] = {k: np.asarray(v) for k, v in result["slack"].items()}
+    result["summary"] = None
+    if result["sch_df"] is not None:
+        sch_df = _decode_frame(result["sch_df"]).astype(np.uint8)
+        result["sch_df"] = sch_df
+        result["summary"] = ScheduleSummary(
+            sch_df.to_numpy(),
+            sch_df.index,
+            sch_df.columns,
+            staff_df["責任者フラグ"],
+            calendar_df["出勤人数"],
+            calendar_df["責任者人数"],
+            staff_df["希望最小出勤日数"],
+            staff_df["希望最大出勤日数"],
+            staff_ng_date,
+            staff_preferred_date,
+        )
+    return result
+
+
+def _encode_frame(df):
+    return {
+        "index_name": df.index.name,
+        "index": df.index.tolist(),
+        "columns": df.columns.tolist(),
+        "data": df.to_numpy().tolist(),
+    }
+
+
+def _decode_frame(value):
+    df = pd.DataFrame(value["data"], index=value["index"], columns=value["columns"])
+    df.index.name = value["index_name"]
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="shift_scheduler.solve_service",
+        description="最適化のジョブを受け付けて解くサービスを起動する",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="ポート番号")
+    parser.add_argument(
+        "--db", default=DEFAULT_DB_PATH, help="ジョブのキューのSQLiteファイル"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2, help="同時に実行する最適化の数"
+    )
+    parser.add_argument(
+        "--no-http",
+        action="store_true",
+        help="HTTPのAPIを起動せず、キューのジョブを解くだけにする（ソルバーを増やす場合）",
+    )
+    args = parser.parse_args(argv)
+    if args.no_http:
+        dispatch(args.db, args.workers)
+    else:
+        serve(args.host, args.port, args.db, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from .preferences import preference_index
+
+
+class ScheduleSummary:
+    def __init__(
+        self,
+        schedule,
+        staff_ids,
+        dates,
+        leader_flag,
+        required_staff,
+        required_leader,
+        min_shift,
+        max_shift,
+        staff_ng_date=None,
+        staff_preferred_date=None,
+    ):
+        # スタッフ×日付の0/1の配列から、シフト表の確認に使う集計をまとめて計算する
+        # 引数の配列はstaff_ids、datesと同じ順番に並べたもの
+        # staff_ng_date、staff_preferred_date（スタッフ -> 希望日）を渡すと、希望の違反日数も数える
+        schedule = np.asarray(schedule)
+        leader_flag = np.asarray(leader_flag, dtype=bool)
+        staff_index = pd.Index(staff_ids, name="スタッフID")
+        date_index = pd.Index(dates, name="日付")
+
+        # 各スタッフのシフト数と、希望最小・最大出勤日数からの不足・超過日数
+        worked = schedule.sum(axis=1, dtype=np.int64)
+        min_shift = np.asarray(min_shift)
+        max_shift = np.asarray(max_shift)
+        self.staff = pd.DataFrame(
+            {
+                "シフト数": worked,
+                "希望最小出勤日数": min_shift,
+                "希望最大出勤日数": max_shift,
+                "不足日数": np.maximum(min_shift - worked, 0),
+                "超過日数": np.maximum(worked - max_shift, 0),
+            },
+            index=staff_index,
+        )
+
+        # 休暇希望日に出勤した日数と、出勤希望日に出勤しなかった日数を、希望のある組だけを見て数える
+        # （ペナルティが0のスラック変数は値が決まらないので、ソルバーの値ではなくシフト表から数える）
+        if staff_ng_date is not None:
+            rows, cols = preference_index(staff_ng_date, staff_ids, dates)
+            self.staff["休暇希望日の出勤日数"] = np.bincount(
+                rows, weights=schedule[rows, cols], minlength=len(staff_index)
+            ).astype(np.int64)
+        if staff_preferred_date is not None:
+            rows, cols = preference_index(staff_preferred_date, staff_ids, dates)
+            self.staff["出勤希望日の欠勤日数"] = np.bincount(
+                rows, weights=1 - schedule[rows, cols], minlength=len(staff_index)
+            ).astype(np.int64)
+
+        # 各日の出勤人数と責任者の人数、それぞれの必要人数に対する過不足
+        assigned = schedule.sum(axis=0, dtype=np.int64)
+        leaders = schedule[leader_flag].sum(axis=0, dtype=np.int64)
+        required_staff = np.asarray(required_staff)
+        required_leader = np.asarray(required_leader)
+        self.days = pd.DataFrame(
+            {
+                "シフト人数": assigned,
+                "出勤人数": required_staff,
+                "人数の過不足": assigned - required_staff,
+                "責任者のシフト人数": leaders,
+                "責任者人数": required_leader,
+                "責任者の過不足": leaders - required_leader,
+            },
+            index=date_index,
+        )
+
+    @property
+    def total_deviation(self):
+        # 全スタッフの不足日数と超過日数の合計
+        return int(self.staff["不足日数"].sum() + self.staff["超過日数"].sum())
+
+    @property
+    def ng_date_worked(self):
+        # 全スタッフの休暇希望日に出勤した日数の合計（休暇希望を渡していなければNone）
+        if "休暇希望日の出勤日数" not in self.staff:
+            return None
+        return int(self.staff["休暇希望日の出勤日数"].sum())
+
+    @property
+    def preferred_date_missed(self):
+        # 全スタッフの出勤希望日に出勤しなかった日数の合計（出勤希望を渡していなければNone）
+        if "出勤希望日の欠勤日数" not in self.staff:
+            return None
+        return int(self.staff["出勤希望日の欠勤日数"].sum())
+
+    @property
+    def uncovered_days(self):
+        # 出勤人数または責任者人数を満たしていない日の一覧
+        short = (self.days["人数の過不足"] < 0) | (self.days["責任者の過不足"] < 0)
+        return self.days.index[short].tolist()
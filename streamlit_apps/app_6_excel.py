@@ -8,16 +8,18 @@ import pandas as pd
 import pulp
 import streamlit as st
 
+from src.shift_scheduler.data_loader import UPLOAD_TYPES, load_calendar, load_staff
+from src.shift_scheduler.excel_export import EXCEL_MIME, schedule_to_excel
 from src.shift_scheduler.ShiftScheduler import ShiftScheduler
 
-
 # タイトル
 st.title("シフトスケジューリングアプリ")
 
 # サイドバー
 st.sidebar.header("データのアップロード")
-calendar_file = st.sidebar.file_uploader("カレンダー", type=["csv"])
-staff_file = st.sidebar.file_uploader("スタッフ", type=["csv"])
+# CSVのほか、Excel（.xlsx）、Parquet、Arrow（Feather）形式のファイルも読み込める
+calendar_file = st.sidebar.file_uploader("カレンダー", type=UPLOAD_TYPES)
+staff_file = st.sidebar.file_uploader("スタッフ", type=UPLOAD_TYPES)
 
 # タブ
 tab1, tab2, tab3 = st.tabs(["カレンダー情報", "スタッフ情報", "シフト表作成"])
@@ -27,16 +29,30 @@ with tab1:
         st.write("カレンダー情報をアップロードしてください")
     else:
         st.markdown("## カレンダー情報")
-        calendar_data = pd.read_csv(calendar_file)
-        st.table(calendar_data)
+        # 列の型をそろえて内容を検証する（同じ内容のファイルは前回の読み込み結果を使う）
+        try:
+            calendar_data = load_calendar(calendar_file)
+        except ValueError as e:
+            st.error("カレンダー情報の内容に誤りがあります")
+            st.text(str(e))
+            calendar_file = None
+        else:
+            st.table(calendar_data)
 
 with tab2:
     if staff_file is None:
         st.write("スタッフ情報をアップロードしてください")
     else:
         st.markdown("## スタッフ情報")
-        staff_data = pd.read_csv(staff_file)
-        st.table(staff_data)
+        # 列の型をそろえて内容を検証する（同じ内容のファイルは前回の読み込み結果を使う）
+        try:
+            staff_data = load_staff(staff_file)
+        except ValueError as e:
+            st.error("スタッフ情報の内容に誤りがあります")
+            st.text(str(e))
+            staff_file = None
+        else:
+            st.table(staff_data)
 
 with tab3:
     if staff_file is None:
@@ -99,3 +115,17 @@ with tab3:
             b64 = base64.b64encode(csv.encode("utf-8-sig")).decode()
             href = f'<a href="data:application/octet-stream;base64,{b64}" download="output.csv">CSVファイルのダウンロード</a>'
             st.markdown(f"{href}", unsafe_allow_html=True)
+
+            # シフト表と最適化結果をExcelファイルでダウンロード（ボタンを押したときに作成する）
+            sch_df = shift_scheduler.sch_df
+            kpis = {
+                "実行ステータス": pulp.LpStatus[shift_scheduler.status],
+                "目的関数値": pulp.value(shift_scheduler.model.objective),
+            }
+            st.download_button(
+                label="Excelファイルのダウンロード",
+                data=lambda: schedule_to_excel(sch_df, kpis=kpis),
+                file_name="output.xlsx",
+                mime=EXCEL_MIME,
+                on_click="ignore",
+            )
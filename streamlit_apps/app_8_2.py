@@ -1,13 +1,232 @@
 import os
 import sys
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import numpy as np
 import pandas as pd
-import pulp
 import streamlit as st
 
-from src.shift_scheduler.ShiftScheduler_8_2 import ShiftScheduler
+from src.shift_scheduler.data_loader import UPLOAD_TYPES, load_calendar, load_staff
+from src.shift_scheduler.backends import available_backends
+from src.shift_scheduler.excel_export import (
+    EXCEL_MIME,
+    result_kpis,
+    schedule_to_excel,
+)
+from src.shift_scheduler.scenario_sweep import (
+    grid_scenarios,
+    pareto_front,
+    random_scenarios,
+    run_scenarios,
+)
+from src.shift_scheduler.preferences import normalize_dates, read_preferences
+from src.shift_scheduler.run_store import RunStore
+from src.shift_scheduler.solve_cache import SolveCache, make_key
+from src.shift_scheduler.solve_job import SolveJobPool
+from src.shift_scheduler.solve_service import RemoteSolveJobPool
+
+
+@st.cache_resource
+def get_solve_cache():
+    # 最適化結果のキャッシュは、すべてのセッションで共有する
+    return SolveCache()
+
+
+@st.cache_resource
+def get_run_store():
+    # 実行結果はSQLiteのファイルに保存して、ページを再読み込みしても読み込み直せるようにする
+    return RunStore()
+
+
+@st.cache_data
+def get_available_backends():
+    # この環境で使えるソルバーのバックエンドの一覧
+    return available_backends()
+
+
+@st.cache_resource
+def get_job_pool():
+    # 最適化を実行するワーカープロセスも、すべてのセッションで共有する
+    # 環境変数SOLVE_SERVICE_URLがあれば、別のプロセスで動くソルバーのサービスに最適化を送る
+    solve_service_url = os.environ.get("SOLVE_SERVICE_URL")
+    if solve_service_url:
+        return RemoteSolveJobPool(solve_service_url)
+    return get_local_job_pool()
+
+
+@st.cache_resource
+def get_local_job_pool():
+    # このプロセスのワーカープロセスで最適化する（ソルバーのサービスに接続できない場合にも使う）
+    return SolveJobPool(max_workers=2)
+
+
+def show_schedule(sch_df):
+    # シフト表の全体をヒートマップで、スタッフと日付で絞り込んだ部分をページ分けした表で表示する
+    # 画面に送るデータはヒートマップの画像と1ページ分の表だけなので、スタッフ数が増えても表示時間は変わらない
+    st.markdown("### 全体")
+    schedule = sch_df.to_numpy(dtype=float)
+    # 画像が縦横800ピクセルに収まるようにする。ピクセルより行（列）が多い場合は、
+    # 何行（列）かずつまとめて出勤の割合の濃さで表す
+    size = 800
+    n_rows, n_cols = schedule.shape
+    row_step = -(-n_rows // size)
+    col_step = -(-n_cols // size)
+    schedule = _aggregate(_aggregate(schedule, row_step, axis=0), col_step, axis=1)
+    # 1マスの幅は画像の幅が800ピクセル程度になるように、高さは幅を超えない範囲で縦に収まるように決める
+    cell_width = max(1, size // schedule.shape[1])
+    cell_height = max(1, min(cell_width, size // schedule.shape[0]))
+    image = np.repeat(
+        np.repeat(255 - schedule * 255, cell_height, axis=0), cell_width, axis=1
+    )
+    caption = "黒: シフトあり、白: シフトなし（縦: スタッフ、横: 日付）"
+    if row_step > 1 or col_step > 1:
+        caption += f"。{row_step}人×{col_step}日ごとに出勤の割合を濃さで表示しています"
+    st.image(image.astype(np.uint8), caption=caption, clamp=True)
+
+    st.markdown("### 絞り込み")
+    staff_filter = st.text_input(
+        "スタッフIDで絞り込む（部分一致、カンマ区切りで複数指定）",
+        key="schedule_staff_filter",
+    )
+    dates = sch_df.columns.tolist()
+    # 前回と日付が変わった場合は、範囲の選択を全期間に戻す
+    if any(d not in dates for d in st.session_state.get("schedule_dates", ())):
+        del st.session_state["schedule_dates"]
+    start_date, end_date = (
+        st.select_slider(
+            "日付の範囲", dates, value=(dates[0], dates[-1]), key="schedule_dates"
+        )
+        if len(dates) > 1
+        else (dates[0], dates[0])
+    )
+    view = sch_df.loc[:, start_date:end_date]
+    keywords = [k.strip() for k in staff_filter.split(",") if k.strip()]
+    if keywords:
+        staff_ids = view.index.astype(str)
+        mask = np.zeros(len(view), dtype=bool)
+        for keyword in keywords:
+            mask |= staff_ids.str.contains(keyword, regex=False)
+        view = view[mask]
+
+    page_size = st.select_slider(
+        "1ページの行数", [25, 50, 100, 200], value=50, key="schedule_page_size"
+    )
+    n_pages = max(1, -(-len(view) // page_size))
+    # 絞り込みでページ数が減った場合は、最後のページを表示する
+    if st.session_state.get("schedule_page", 1) > n_pages:
+        st.session_state["schedule_page"] = n_pages
+    page = st.number_input(
+        f"ページ（全{n_pages}ページ、{len(view)}人）",
+        1,
+        n_pages,
+        1,
+        key="schedule_page",
+    )
+    st.dataframe(
+        view.iloc[(page - 1) * page_size : page * page_size].astype(bool),
+    )
+
+
+def _aggregate(values, step, axis):
+    # axisの方向にstep個ずつの平均をとる（最後のまとまりは残りの行・列だけの平均）
+    if step <= 1:
+        return values
+    starts = np.arange(0, values.shape[axis], step)
+    counts = np.diff(np.append(starts, values.shape[axis]))
+    shape = [-1 if a == axis else 1 for a in range(values.ndim)]
+    return np.add.reduceat(values, starts, axis=axis) / counts.reshape(shape)
+
+
+def show_result(result, load_time=None):
+    # 最適化結果を表示する（保存した実行結果を読み込んだ場合はデータの読み込み時間を省略する）
+    if result["sch_df"] is None:
+        st.error(f"シフト表が得られませんでした（{result['status']}）")
+        return
+    sch_df = result["sch_df"]
+    st.session_state["sch_df"] = sch_df
+    if not result["optimal"]:
+        st.warning("最適性が証明される前に打ち切られたため、暫定解を表示しています")
+
+    st.markdown("## 最適化結果")
+    if result.get("run_id") is not None:
+        st.info(f"保存した実行結果（#{result['run_id']}）を表示しています")
+
+    # 最適化結果の出力
+    st.write("実行ステータス:", result["status"])
+    st.write("解の状態:", result["solution_status"])
+    st.write("目的関数値:", result["objective"])
+    st.write("求解時間（秒）:", result["solve_time"])
+    st.write("最初の実行可能解までの時間（秒）:", result["time_to_first_feasible"])
+
+    # 遅い実行の原因を調べるための、各段階の時間とメモリ、数理モデルの大きさ
+    with st.expander("計算の詳細"):
+        if load_time is not None:
+            st.write("データの読み込み時間（秒）:", load_time)
+        phase_stats = result.get("phase_stats") or {}
+        if phase_stats:
+            st.dataframe(
+                pd.DataFrame.from_dict(phase_stats, orient="index").rename(
+                    columns={
+                        "time": "時間（秒）",
+                        "max_rss_mb": "最大メモリ使用量（MB）",
+                        "traced_peak_mb": "確保したメモリのピーク（MB）",
+                    }
+                )
+            )
+        model_stats = result.get("model_stats") or {}
+        if model_stats:
+            st.write(
+                f"変数の数: {model_stats['variables']}"
+                f"（0-1変数: {model_stats['binary_variables']}）"
+            )
+            st.write("制約の数:", model_stats["constraints"])
+            if "nonzeros" in model_stats:
+                st.write("非ゼロ係数の数:", model_stats["nonzeros"])
+        if result.get("profile_report"):
+            st.code(result["profile_report"])
+
+    st.markdown("## シフト表")
+    show_schedule(sch_df)
+
+    # 集計は最適化結果と一緒に計算済みなので、データフレームを結合せずにそのまま表示する
+    summary = result["summary"]
+    st.markdown("## シフト数の充足確認")
+    # 各スタッフのシフト数と希望出勤日数をstreamlitのbar chartで表示
+    st.bar_chart(
+        summary.staff[["シフト数", "希望最小出勤日数", "希望最大出勤日数"]],
+        stack=False,
+    )
+    st.write(f"希望出勤日数からの不足・超過日数の合計: {summary.total_deviation}日")
+
+    st.markdown("## スタッフの希望の確認")
+    # 各日のシフト人数と必要な出勤人数をstreamlitのbar chartで表示
+    st.bar_chart(summary.days[["シフト人数", "出勤人数"]], stack=False)
+
+    st.markdown("## 責任者の合計シフト数の充足確認")
+    # 各日の責任者のシフト人数と必要な責任者人数をstreamlitのbar chartで表示
+    st.bar_chart(summary.days[["責任者のシフト人数", "責任者人数"]], stack=False)
+    if summary.uncovered_days:
+        st.warning(
+            "必要人数を満たしていない日: " + "、".join(map(str, summary.uncovered_days))
+        )
+
+    # シフト表のダウンロード
+    st.download_button(
+        label="シフト表をダウンロード",
+        data=sch_df.to_csv().encode("utf-8"),
+        file_name="output.csv",
+        mime="text/csv",
+    )
+    # Excelファイルはボタンを押したときに作る（大きなシフト表では作成に時間がかかるため）
+    st.download_button(
+        label="シフト表と集計をExcelでダウンロード",
+        data=lambda: schedule_to_excel(sch_df, summary, result_kpis(result)),
+        file_name="output.xlsx",
+        mime=EXCEL_MIME,
+        on_click="ignore",
+    )
 
 
 # タイトル
@@ -15,8 +234,30 @@ st.title("シフトスケジューリングアプリ")
 
 # サイドバー
 st.sidebar.header("データのアップロード")
-calendar_file = st.sidebar.file_uploader("カレンダー", type=["csv"])
-staff_file = st.sidebar.file_uploader("スタッフ", type=["csv"])
+# CSVのほか、大きなデータ向けにParquet、Arrow（Feather）形式も読み込める
+calendar_file = st.sidebar.file_uploader("カレンダー", type=UPLOAD_TYPES)
+staff_file = st.sidebar.file_uploader("スタッフ", type=UPLOAD_TYPES)
+# 「スタッフID,日付,種類」の形式で、休暇希望日と出勤希望日をまとめて読み込む（省略可）
+preference_file = st.sidebar.file_uploader("希望日（任意）", type=["csv"])
+
+# 保存した実行結果は、データをアップロードしなくても求解せずに表示できる
+st.sidebar.header("過去の実行結果")
+run_store = get_run_store()
+runs = run_store.list_runs()
+if runs.empty:
+    st.sidebar.write("保存された実行結果はありません")
+else:
+    run_labels = {
+        r.id: f"#{r.id} {r.created_at:%m/%d %H:%M} {r.status} "
+        f"目的関数値: {r.objective} （{r.n_staff}人×{r.n_days}日）"
+        for r in runs.itertuples()
+    }
+    selected_run = st.sidebar.selectbox(
+        "実行結果", list(run_labels), format_func=run_labels.get
+    )
+    if st.sidebar.button("実行結果を表示"):
+        st.session_state["result"] = run_store.load(selected_run)
+        st.session_state.pop("solve_job", None)
 
 # タブ
 tab1, tab2, tab3 = st.tabs(["カレンダー情報", "スタッフ情報", "シフト表作成"])
@@ -26,115 +267,329 @@ with tab1:
         st.write("カレンダー情報をアップロードしてください")
     else:
         st.markdown("## カレンダー情報")
-        calendar_data = pd.read_csv(calendar_file)
-        st.table(calendar_data)
+        load_start = time.perf_counter()
+        # 列の型をそろえて内容を検証する（同じ内容のファイルは前回の読み込み結果を使う）
+        try:
+            calendar_data = load_calendar(calendar_file)
+        except ValueError as e:
+            st.error("カレンダー情報の内容に誤りがあります")
+            st.text(str(e))
+            calendar_file = None
+        else:
+            calendar_load_time = time.perf_counter() - load_start
+            st.dataframe(calendar_data, hide_index=True)
 
 with tab2:
     if staff_file is None:
         st.write("スタッフ情報をアップロードしてください")
     else:
         st.markdown("## スタッフ情報")
-        staff_data = pd.read_csv(staff_file)
-        st.table(staff_data)
-
-        ## 休暇希望の設定
-        st.markdown("## 休暇希望")
-        if calendar_file is None:
-            st.write("カレンダー情報をアップロードしてください")
+        load_start = time.perf_counter()
+        # 列の型をそろえて内容を検証する（同じ内容のファイルは前回の読み込み結果を使う）
+        try:
+            staff_data = load_staff(staff_file)
+        except ValueError as e:
+            st.error("スタッフ情報の内容に誤りがあります")
+            st.text(str(e))
+            staff_file = None
         else:
-            staff_ng_date_radio_button = {}
-            # スタッフIDごとにいずれかの日付、またはすべてOKにするためのラジオボタンを作成
-            for i in range(len(staff_data)):
-                staff_id = staff_data.loc[i, "スタッフID"]
-                st.write()
-                staff_ng_date_radio_button[staff_id] = st.radio(
-                    staff_id,
-                    ["すべてOK"]
-                    + [
-                        calendar_data.loc[j, "日付"]
-                        for j in range(calendar_data.shape[0])
-                    ],
-                    horizontal=True,
-                )
+            staff_load_time = time.perf_counter() - load_start
+            st.dataframe(staff_data, hide_index=True)
+
 
 with tab3:
     if staff_file is None:
         st.write("スタッフ情報をアップロードしてください")
     if calendar_file is None:
         st.write("カレンダー情報をアップロードしてください")
-    if staff_file is not None and calendar_file is not None:
-        staff_penalty = {}
-        # スタッフごとの希望違反のペナルティをStreamlitのレバーで設定
-        for i, row in staff_data.iterrows():
-            staff_penalty[row["スタッフID"]] = st.slider(
-                f"{row['スタッフID']}の希望違反ペナルティ",
-                0,  # 最小値
-                100,  # 最大値
-                50,  # デフォルト値は50
-                key=row["スタッフID"],
+    if staff_file is None or calendar_file is None:
+        if st.session_state.get("result") is not None:
+            show_result(st.session_state["result"])
+    else:
+        # スタッフごとの希望違反ペナルティと休暇希望日・出勤希望日を1つの表で編集する
+        # フォームの中の入力は「最適化実行」を押すまで反映されないので、編集中に再実行されない
+        dates = calendar_data["日付"].tolist()
+        initial_ng_date, initial_preferred_date = {}, {}
+        if preference_file is not None:
+            try:
+                initial_ng_date, initial_preferred_date = read_preferences(
+                    preference_file
+                )
+            except ValueError as e:
+                st.error(str(e))
+        with st.form("preference_form"):
+            st.markdown("## スタッフごとの設定")
+            preference_data = st.data_editor(
+                pd.DataFrame(
+                    {
+                        "スタッフID": staff_data["スタッフID"],
+                        "希望違反ペナルティ": 50,
+                        "休暇希望日": [
+                            normalize_dates(initial_ng_date.get(s))
+                            for s in staff_data["スタッフID"]
+                        ],
+                        "出勤希望日": [
+                            normalize_dates(initial_preferred_date.get(s))
+                            for s in staff_data["スタッフID"]
+                        ],
+                    }
+                ),
+                column_config={
+                    "スタッフID": st.column_config.TextColumn(disabled=True),
+                    "希望違反ペナルティ": st.column_config.NumberColumn(
+                        min_value=0, max_value=100, step=1, required=True
+                    ),
+                    "休暇希望日": st.column_config.MultiselectColumn(options=dates),
+                    "出勤希望日": st.column_config.MultiselectColumn(options=dates),
+                },
+                hide_index=True,
+                num_rows="fixed",
+                key="preference_editor",
+            )
+            staff_penalty = dict(
+                zip(
+                    preference_data["スタッフID"], preference_data["希望違反ペナルティ"]
+                )
             )
-        # 希望休暇ペナルティをStreamlitのレバーで設定
-        penalty_off = st.slider("希望休暇ペナルティ", 0, 100, 50)
-        optimize_button = st.button("最適化実行")
+            # 空欄のセルはNoneになるので、日付のリストにそろえる
+            staff_ng_date = {
+                s: normalize_dates(d)
+                for s, d in zip(
+                    preference_data["スタッフID"], preference_data["休暇希望日"]
+                )
+            }
+            staff_preferred_date = {
+                s: normalize_dates(d)
+                for s, d in zip(
+                    preference_data["スタッフID"], preference_data["出勤希望日"]
+                )
+            }
+            # 希望休暇ペナルティと出勤希望ペナルティをStreamlitのレバーで設定
+            penalty_off = st.slider("希望休暇ペナルティ", 0, 100, 50)
+            penalty_preferred = st.slider("出勤希望ペナルティ", 0, 100, 50)
+            # ソルバーのスレッド数、制限時間、打ち切りギャップを設定
+            with st.expander("ソルバーの設定"):
+                solver_backend = st.selectbox(
+                    "ソルバー", get_available_backends(), key="solver_backend"
+                )
+                st.caption(
+                    "前回のシフト表を初期解（ウォームスタート）に使うのは、"
+                    "CBCのバックエンド（pulp_cbc、pulp_cbc_cached）だけです"
+                )
+                solver_threads = st.number_input(
+                    "スレッド数", 1, os.cpu_count() or 1, 1, key="solver_threads"
+                )
+                solver_time_limit = st.number_input(
+                    "制限時間（秒、0は制限なし）", 0, 3600, 0, key="solver_time_limit"
+                )
+                solver_gap_rel = st.number_input(
+                    "相対ギャップ（%）", 0.0, 100.0, 0.0, key="solver_gap_rel"
+                )
+                solver_gap_abs = st.number_input(
+                    "絶対ギャップ", 0.0, None, 0.0, key="solver_gap_abs"
+                )
+                solver_profile = st.checkbox(
+                    "関数ごとの時間とメモリを詳しく計測する（cProfile・tracemalloc）",
+                    key="solver_profile",
+                )
+            solver_options = {
+                "threads": solver_threads,
+                "time_limit": solver_time_limit or None,
+                "gap_rel": solver_gap_rel / 100 or None,
+                "gap_abs": solver_gap_abs or None,
+                "profile": solver_profile,
+            }
+            optimize_button = st.form_submit_button("最適化実行")
+        solve_cache = get_solve_cache()
         if optimize_button:
-            # ShiftSchedulerクラスのインスタンスを作成
-            shift_scheduler = ShiftScheduler()
-            # データをセット
-            shift_scheduler.set_data(
+            # 同じ入力データとパラメータの結果がキャッシュにあれば、求解せずにそれを使う
+            cache_key = make_key(
                 staff_data,
                 calendar_data,
                 staff_penalty,
-                staff_ng_date_radio_button,  # 休暇希望のラジオボタン
-                penalty_off,  # 休暇希望のペナルティ
+                staff_ng_date,
+                penalty_off,
+                staff_preferred_date,
+                penalty_preferred,
             )
-            # モデルを構築
-            shift_scheduler.build_model()
-            # 最適化を実行
-            shift_scheduler.solve()
-
-            st.markdown("## 最適化結果")
-
-            # 最適化結果の出力
-            st.write("実行ステータス:", pulp.LpStatus[shift_scheduler.status])
-            st.write("目的関数値:", pulp.value(shift_scheduler.model.objective))
-
-            st.markdown("## シフト表")
-            st.table(shift_scheduler.sch_df)
-
-            st.markdown("## シフト数の充足確認")
-            # 各スタッフの合計シフト数をstreamlitのbar chartで表示
-            shift_sum = shift_scheduler.sch_df.sum(axis=1)
-            st.bar_chart(shift_sum)
-
-            st.markdown("## スタッフの希望の確認")
-            # 各スロットの合計シフト数をstreamlitのbar chartで表示
-            shift_sum_slot = shift_scheduler.sch_df.sum(axis=0)
-            st.bar_chart(shift_sum_slot)
-
-            st.markdown("## 責任者の合計シフト数の充足確認")
-            # shift_scheduleに対してstaff_dataをマージして責任者の合計シフト数を計算
-            shift_schedule_with_staff_data = pd.merge(
-                shift_scheduler.sch_df,
-                staff_data,
-                left_index=True,
-                right_on="スタッフID",
-            )
-            shift_chief_only = shift_schedule_with_staff_data.query("責任者フラグ == 1")
-            shift_chief_only = shift_chief_only.drop(
-                columns=[
-                    "スタッフID",
-                    "責任者フラグ",
-                    "希望最小出勤日数",
-                    "希望最大出勤日数",
-                ]
+            # 詳しく計測する場合は、キャッシュを使わずに最適化を実行する
+            cached_result = None if solver_profile else solve_cache.get(cache_key)
+            # キャッシュになくても、同じ条件で最適解が得られた実行結果が保存されていれば読み込む
+            if cached_result is None and not solver_profile:
+                run_id = run_store.find(cache_key)
+                if run_id is not None:
+                    cached_result = run_store.load(run_id)
+            if cached_result is None:
+                # 最適化はワーカープロセスで実行し、画面は進み具合を表示しながら結果を待つ
+                # 前回のシフト表があれば初期解として使う（CBCのバックエンドの場合）
+                job_args = dict(
+                    staff_df=staff_data,
+                    calendar_df=calendar_data,
+                    staff_penalty=staff_penalty,
+                    staff_ng_date=staff_ng_date,  # 休暇希望日
+                    off_penalty=penalty_off,  # 休暇希望のペナルティ
+                    initial_schedule=st.session_state.get("sch_df"),
+                    solver_options=solver_options,
+                    backend=solver_backend,
+                    staff_preferred_date=staff_preferred_date,
+                    preferred_penalty=penalty_preferred,
+                )
+                job_pool = get_job_pool()
+                st.session_state["solve_warning"] = None
+                try:
+                    st.session_state["solve_job"] = job_pool.submit(**job_args)
+                except (OSError, ValueError) as e:
+                    if not isinstance(job_pool, RemoteSolveJobPool):
+                        raise
+                    # ソルバーのサービスが起動していない場合などは、このプロセスで解く
+                    # （進み具合の表示で再実行しても消えないように、警告はセッションに残す）
+                    st.session_state["solve_warning"] = (
+                        "ソルバーのサービスに接続できないため、このプロセスで最適化します"
+                        f"（{e}）"
+                    )
+                    st.session_state["solve_job"] = get_local_job_pool().submit(
+                        **job_args
+                    )
+                st.session_state["solve_cache_key"] = cache_key
+                st.session_state["run_params"] = dict(
+                    staff_df=staff_data,
+                    calendar_df=calendar_data,
+                    staff_penalty=staff_penalty,
+                    staff_ng_date=staff_ng_date,
+                    off_penalty=penalty_off,
+                    staff_preferred_date=staff_preferred_date,
+                    preferred_penalty=penalty_preferred,
+                    backend=solver_backend,
+                    solver_options=solver_options,
+                )
+                st.session_state.pop("result", None)
+            else:
+                st.session_state["result"] = cached_result
+                st.info("同じ条件の最適化結果をキャッシュから表示しています")
+
+        solve_job = st.session_state.get("solve_job")
+        if solve_job is not None:
+            if st.session_state.get("solve_warning"):
+                st.warning(st.session_state["solve_warning"])
+            if not solve_job.done():
+                if solve_job.status == "queued":
+                    st.write("他の最適化の終了を待っています")
+                else:
+                    st.write(
+                        f"最適化を実行中です（経過時間: {solve_job.elapsed:.1f}秒）"
+                    )
+                if st.button("最適化を中断"):
+                    solve_job.cancel()
+                else:
+                    time.sleep(0.5)
+                st.rerun()
+
+            del st.session_state["solve_job"]
+            st.session_state.pop("solve_warning", None)
+            if solve_job.status == "done":
+                st.session_state["result"] = solve_job.result
+                # 入力データとパラメータ、結果をまとめて保存する
+                run_store.save(
+                    solve_job.result,
+                    **st.session_state.pop("run_params"),
+                    params_hash=st.session_state["solve_cache_key"],
+                )
+                # 制限時間などで打ち切られた暫定解はキャッシュしない
+                if solve_job.result["optimal"]:
+                    solve_cache.put(
+                        st.session_state["solve_cache_key"], solve_job.result
+                    )
+            elif solve_job.status == "cancelled":
+                st.warning("最適化を中断しました")
+            else:
+                st.error(f"最適化に失敗しました: {solve_job.error}")
+
+        result = st.session_state.get("result")
+        if result is not None:
+            show_result(result, calendar_load_time + staff_load_time)
+
+        # ペナルティの設定をまとめて試し、乖離日数と休暇希望の違反数のトレードオフを比べる
+        with st.expander("ペナルティの一括比較"):
+            sweep_mode = st.radio(
+                "ペナルティの選び方",
+                ["グリッド", "ランダム"],
+                horizontal=True,
+                key="sweep_mode",
             )
-            shift_chief_sum = shift_chief_only.sum(axis=0)
-            st.bar_chart(shift_chief_sum)
-
-            # シフト表のダウンロード
-            st.download_button(
-                label="シフト表をダウンロード",
-                data=shift_scheduler.sch_df.to_csv().encode("utf-8"),
-                file_name="output.csv",
-                mime="text/csv",
+            if sweep_mode == "グリッド":
+                sweep_values = st.multiselect(
+                    "試すペナルティの値（全スタッフ共通の希望違反ペナルティと希望休暇ペナルティ）",
+                    list(range(0, 101, 10)),
+                    [0, 20, 50, 100],
+                    key="sweep_values",
+                )
+            else:
+                sweep_n = st.number_input("試す設定の数", 1, 500, 20, key="sweep_n")
+            sweep_workers = st.number_input(
+                "並列数",
+                1,
+                os.cpu_count() or 1,
+                os.cpu_count() or 1,
+                key="sweep_workers",
             )
+            if st.button("一括比較を実行"):
+                staff_ids = staff_data["スタッフID"].tolist()
+                if sweep_mode == "グリッド":
+                    scenarios = grid_scenarios(staff_ids, sweep_values, sweep_values)
+                else:
+                    scenarios = random_scenarios(staff_ids, sweep_n)
+                with st.spinner(f"{len(scenarios)}通りの設定を最適化しています"):
+                    st.session_state["sweep_results"] = run_scenarios(
+                        staff_data,
+                        calendar_data,
+                        staff_ng_date,
+                        scenarios,
+                        max_workers=sweep_workers,
+                        solver_options=solver_options,
+                        staff_preferred_date=staff_preferred_date,
+                        preferred_penalty=penalty_preferred,
+                    )
+
+            sweep_results = st.session_state.get("sweep_results")
+            if sweep_results:
+                front = pareto_front(sweep_results)
+                st.markdown("### 他の設定に劣らないシフト表")
+                st.dataframe(
+                    pd.DataFrame(
+                        [
+                            {
+                                "設定": r["scenario"],
+                                "乖離日数": r["deviation"],
+                                "休暇希望の違反数": r["ng_violation"],
+                                "希望休暇ペナルティ": r["off_penalty"],
+                                "希望違反ペナルティ": " ".join(
+                                    f"{s}:{p}" for s, p in r["staff_penalty"].items()
+                                ),
+                            }
+                            for r in front
+                        ]
+                    ),
+                    hide_index=True,
+                )
+                selected = st.selectbox(
+                    "シフト表を表示する設定", [r["scenario"] for r in front]
+                )
+                st.dataframe(sweep_results[selected]["sch_df"])
+
+                st.markdown("### 設定ごとの時間")
+                st.dataframe(
+                    pd.DataFrame(
+                        [
+                            {
+                                "設定": r["scenario"],
+                                "状態": r["status"],
+                                "目的関数値": r["objective"],
+                                "モデル構築（秒）": r["build_time"],
+                                "求解（秒）": r["solve_time"],
+                                "合計（秒）": r["total_time"],
+                            }
+                            for r in sweep_results
+                        ]
+                    ),
+                    hide_index=True,
+                )
@@ -6,6 +6,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import pandas as pd
 import streamlit as st
 
+from src.shift_scheduler.data_loader import UPLOAD_TYPES, load_calendar, load_staff
 from src.shift_scheduler.ShiftScheduler_9 import ShiftScheduler
 
 # タイトル
@@ -13,8 +14,9 @@ st.title("シフトスケジューリングアプリ")
 
 # サイドバー
 st.sidebar.header("データのアップロード")
-calendar_file = st.sidebar.file_uploader("カレンダー", type=["csv"])
-staff_file = st.sidebar.file_uploader("スタッフ", type=["csv"])
+# CSVのほか、大きなデータ向けにParquet、Arrow（Feather）形式も読み込める
+calendar_file = st.sidebar.file_uploader("カレンダー", type=UPLOAD_TYPES)
+staff_file = st.sidebar.file_uploader("スタッフ", type=UPLOAD_TYPES)
 
 # タブ
 tab1, tab2, tab3 = st.tabs(["カレンダー情報", "スタッフ情報", "シフト表作成"])
@@ -24,16 +26,30 @@ with tab1:
         st.write("カレンダー情報をアップロードしてください")
     else:
         st.markdown("## カレンダー情報")
-        calendar_data = pd.read_csv(calendar_file)
-        st.table(calendar_data)
+        # 列の型をそろえて内容を検証する（同じ内容のファイルは前回の読み込み結果を使う）
+        try:
+            calendar_data = load_calendar(calendar_file)
+        except ValueError as e:
+            st.error("カレンダー情報の内容に誤りがあります")
+            st.text(str(e))
+            calendar_file = None
+        else:
+            st.table(calendar_data)
 
 with tab2:
     if staff_file is None:
         st.write("スタッフ情報をアップロードしてください")
     else:
         st.markdown("## スタッフ情報")
-        staff_data = pd.read_csv(staff_file)
-        st.table(staff_data)
+        # 列の型をそろえて内容を検証する（同じ内容のファイルは前回の読み込み結果を使う）
+        try:
+            staff_data = load_staff(staff_file)
+        except ValueError as e:
+            st.error("スタッフ情報の内容に誤りがあります")
+            st.text(str(e))
+            staff_file = None
+        else:
+            st.table(staff_data)
 
 with tab3:
     if staff_file is None:
@@ -51,22 +67,55 @@ with tab3:
                 50,  # デフォルト値は50
                 key=row["スタッフID"],
             )
+        # 目的関数の形式（二次のままか、区分線形近似して混合整数線形計画にするか）
+        objective_mode = st.radio(
+            "目的関数",
+            ["quadratic", "linear"],
+            format_func=lambda m: {
+                "quadratic": "二乗和（混合整数二次計画）",
+                "linear": "二乗和の区分線形近似（混合整数線形計画）",
+            }[m],
+        )
         optimize_button = st.button("最適化実行")
         if optimize_button:
-            # ShiftSchedulerクラスのインスタンスを作成
-            shift_scheduler = ShiftScheduler()
-            # データをセット
-            shift_scheduler.set_data(staff_data, calendar_data, staff_penalty)
-            # モデルを構築
-            shift_scheduler.build_model()
+            # 前回のShiftSchedulerのインスタンスがあれば、パラメータだけを更新して再利用
+            shift_scheduler = st.session_state.get("shift_scheduler_9")
+            if (
+                shift_scheduler is None
+                or shift_scheduler.objective_mode != objective_mode
+                or not shift_scheduler.update_data(
+                    staff_data, calendar_data, staff_penalty
+                )
+            ):
+                # ShiftSchedulerクラスのインスタンスを作成
+                shift_scheduler = ShiftScheduler()
+                # データをセット
+                shift_scheduler.set_data(staff_data, calendar_data, staff_penalty)
+                # モデルを構築
+                shift_scheduler.build_model(objective_mode)
+                st.session_state["shift_scheduler_9"] = shift_scheduler
             # 最適化を実行
-            shift_scheduler.solve()
+            # 線形の場合は混合整数線形計画ソルバーのHiGHSを使う
+            shift_scheduler.solve(
+                solver="HIGHS" if objective_mode == "linear" else None
+            )
 
             st.markdown("## 最適化結果")
 
             # 最適化結果の出力
             st.write("実行ステータス:", shift_scheduler.prob.status)
             st.write("目的関数値:", shift_scheduler.prob.value)
+            # シフト表が得られなかった場合は、二乗和での評価とシフト表を表示しない
+            if shift_scheduler.sch_df is not None:
+                st.write(
+                    "二乗和で評価した目的関数値:",
+                    shift_scheduler.evaluate_quadratic_objective(),
+                )
+            st.write("問題の変換時間（秒）:", shift_scheduler.compile_time)
+            st.write("求解時間（秒）:", shift_scheduler.solve_time)
+            if shift_scheduler.sch_df is None:
+                st.error("最適解が得られなかったため、シフト表を表示できません")
+                st.stop()
 
             st.markdown("## シフト表")
             st.table(shift_scheduler.sch_df)